@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from celery.schedules import crontab
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -50,6 +53,25 @@ CRONJOBS = [
     ('0 0 * * *', 'crm.cron.send_order_reminders'),
 ]
 
+# Celery (crm/celery.py). The order roll-up behind revenueByPeriod and
+# ordersByPeriod only ever adds closed days, so hourly runs are cheap.
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = CELERY_BROKER_URL
+CELERY_ACCEPT_CONTENT = ['json']
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_RESULT_SERIALIZER = 'json'
+
+CELERY_BEAT_SCHEDULE = {
+    'generate-crm-report': {
+        'task': 'crm.tasks.generate_crm_report',
+        'schedule': crontab(day_of_week='mon', hour=6, minute=0),
+    },
+    'roll-up-order-analytics': {
+        'task': 'crm.tasks.roll_up_order_analytics',
+        'schedule': crontab(minute=5),
+    },
+}
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -58,6 +80,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'crm.routing.DatabaseRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'alx_backend_graphql.urls'
@@ -87,7 +110,42 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Read replica for GraphQL query operations (see CRM_DB_ROUTING). Locally
+    # a copy of db.sqlite3 refreshed by `manage.py sync_replica`.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+# CRM_DB_PROFILE=production keeps connections open across requests, starts
+# write transactions with BEGIN IMMEDIATE (no lock-upgrade deadlocks under
+# WAL) and applies the CRM_SQLITE pragmas to every new connection.
+CRM_DB_PROFILE = os.environ.get('CRM_DB_PROFILE', 'development')
+
+if CRM_DB_PROFILE == 'production':
+    for database in DATABASES.values():
+        database.update({
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 5},
+        })
+
+# See crm/database.py for the pragma defaults.
+CRM_SQLITE = {
+    'ENABLED': CRM_DB_PROFILE == 'production',
+}
+
+# With ENABLED, query operations read from READ_ALIAS; mutations, and any
+# read after a write in the same request, use WRITE_ALIAS.
+DATABASE_ROUTERS = ['crm.routing.ReadReplicaRouter']
+
+CRM_DB_ROUTING = {
+    'ENABLED': False,
+    'READ_ALIAS': 'replica',
+    'WRITE_ALIAS': 'default',
 }
 
 
@@ -133,5 +191,75 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 GRAPHENE = {
-    "SCHEMA": "alx_backend_graphql_crm.schema.schema"
+    "SCHEMA": "alx_backend_graphql.schema.schema",
+    "MIDDLEWARE": ["crm.tracing.TracingMiddleware"],
+}
+
+# Opt-in cache of read-only GraphQL responses, invalidated per model on
+# writes. The default local-memory cache is per process; point CACHE at a
+# shared backend before enabling it with several workers.
+CRM_GRAPHQL_RESPONSE_CACHE = {
+    "ENABLED": False,
+    "CACHE": "default",
+    "TIMEOUT": 30,
+}
+
+# How cron jobs and Celery tasks run their GraphQL documents: "local"
+# executes them in process against the schema, "http" POSTs them to URL
+# (for jobs deployed away from the web tier's database).
+CRM_GRAPHQL_JOBS = {
+    "TRANSPORT": "local",
+    "URL": "http://localhost:8000/graphql",
+    "TIMEOUT": 10,
+}
+
+# Documents over any of these are rejected before execution; see
+# crm/complexity.py for how depth, nodes and cost are estimated.
+CRM_GRAPHQL_LIMITS = {
+    "MAX_DEPTH": 15,
+    "MAX_NODES": 10000,
+    "MAX_COST": 20000,
+    # Rows assumed per parent for a nested connection without first/last.
+    "NESTED_PAGE_SIZE": 10,
+    # A POST body may also be a JSON array of up to this many operations.
+    "MAX_BATCH_SIZE": 10,
+}
+
+# Streaming bulk transfer at /export/<dataset>.<csv|ndjson> and
+# /import/<dataset>; see crm/transfer.py. Exports answer staff sessions or
+# "Authorization: Bearer $CRM_TRANSFER_TOKEN"; imports need the token.
+CRM_TRANSFER = {
+    "EXPORT_CHUNK_SIZE": 2000,
+    "IMPORT_BATCH_SIZE": 500,
+    "MAX_REPORTED_ERRORS": 1000,
+    "TOKEN": os.environ.get("CRM_TRANSFER_TOKEN"),
+}
+
+# Per-operation tracing: metrics at /graphql/metrics, and operations over
+# SLOW_OPERATION_MS logged to crm.graphql.slow. The metrics and
+# /graphql/cache-stats answer staff sessions, or
+# "Authorization: Bearer $CRM_METRICS_TOKEN".
+CRM_GRAPHQL_TRACING = {
+    "ENABLED": True,
+    "SLOW_OPERATION_MS": 500,
+    "METRICS_TOKEN": os.environ.get("CRM_METRICS_TOKEN"),
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "slow_graphql": {
+            "class": "logging.FileHandler",
+            "filename": "/tmp/crm_slow_graphql_log.txt",
+            "delay": True,
+        },
+    },
+    "loggers": {
+        "crm.graphql.slow": {
+            "handlers": ["slow_graphql"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
 }
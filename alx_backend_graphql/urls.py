@@ -1,9 +1,17 @@
 from django.contrib import admin
 from django.urls import path
-from graphene_django.views import GraphQLView
 from django.views.decorators.csrf import csrf_exempt
+from crm.views import (
+    AsyncCRMGraphQLView, CRMGraphQLView, export_dataset, graphql_cache_stats, graphql_metrics,
+    import_dataset,
+)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('graphql', csrf_exempt(GraphQLView.as_view(graphiql=True))),
+    path('graphql', csrf_exempt(CRMGraphQLView.as_view(graphiql=True))),
+    path('graphql/async', csrf_exempt(AsyncCRMGraphQLView.as_view())),
+    path('graphql/cache-stats', graphql_cache_stats),
+    path('graphql/metrics', graphql_metrics),
+    path('export/<slug:dataset>.<slug:format>', export_dataset),
+    path('import/<slug:dataset>', csrf_exempt(import_dataset)),
 ]
@@ -0,0 +1,301 @@
+import heapq
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Min, Subquery, Sum
+from django.db.models.functions import Round, TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from crm import response_cache
+from crm.models import LINE_TOTAL, Order, OrderLine, OrderRollup, OrderRollupState
+
+STATE_PK = 1
+DEFAULT_CHUNK_DAYS = 31
+CENTS = Decimal("0.01")
+
+# Bucket start for a date expression; weeks start on Monday.
+PERIODS = {
+    "day": lambda day: day,
+    "week": TruncWeek,
+    "month": TruncMonth,
+}
+BREAKDOWNS = ("customer", "product")
+RANKS = ("orders", "revenue")
+
+
+def midnight(day):
+    """The aware datetime at which ``day`` starts in the current time zone."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def today():
+    return timezone.localdate()
+
+
+# =====================================
+# High-water mark
+# =====================================
+def rolled_up_until():
+    """The first day OrderRollup does not cover, or None before the first roll-up."""
+    mark = OrderRollupState.objects.filter(pk=STATE_PK).values_list("high_water_mark", flat=True).first()
+    return timezone.localdate(mark) if mark is not None else None
+
+
+def rewind(*dates):
+    """
+    Make the next roll_up() recompute from the earliest of ``dates``; call
+    it after writing orders dated then. Until then queries read those days
+    from the order tables. Orders dated today cost nothing.
+    """
+    dates = [d for d in dates if d is not None]
+    if not dates or min(dates) >= midnight(today()):
+        return
+    earliest = min(dates)
+    OrderRollupState.objects.filter(pk=STATE_PK, high_water_mark__gt=earliest).update(
+        high_water_mark=earliest
+    )
+
+
+def rewind_orders(order_ids):
+    """rewind() to the earliest date among ``order_ids``, in one UPDATE."""
+    earliest = Subquery(
+        Order.objects.filter(pk__in=order_ids).order_by("order_date").values("order_date")[:1]
+    )
+    OrderRollupState.objects.filter(pk=STATE_PK, high_water_mark__gt=earliest).update(
+        high_water_mark=earliest
+    )
+
+
+def forget_orders(orders):
+    """
+    Take ``orders``, which are about to be deleted, out of the rolled-up
+    days in place. rewind() would recompute everything since the earliest
+    of them, years of history for a cleanup of long-inactive customers.
+    Call it in the same transaction as the delete.
+    """
+    rolled = rolled_up_until()
+    if rolled is None:
+        return
+    orders = orders.filter(order_date__lt=midnight(rolled)).annotate(
+        day=TruncDate("order_date")
+    ).order_by()
+    lines = OrderLine.objects.filter(order__in=orders.values("pk")).annotate(
+        day=TruncDate("order__order_date")
+    ).order_by()
+    totals = {"orders": Count("pk"), "revenue": Sum("total_amount")}
+    line_totals = {"orders": Count("pk"), "revenue": Sum(LINE_TOTAL)}
+    changed, emptied = [], []
+    for rows, key, row_totals in (
+        (orders, None, totals),
+        (orders, "customer_id", totals),
+        (lines, "product_id", line_totals),
+    ):
+        fields = ("day", key) if key else ("day",)
+        deltas = {
+            tuple(row[f] for f in fields): row
+            for row in rows.values(*fields).annotate(**row_totals)
+        }
+        if not deltas:
+            continue
+        rollup = OrderRollup.objects.filter(day__in={d[0] for d in deltas})
+        for name in BREAKDOWNS:
+            if f"{name}_id" != key:
+                rollup = rollup.filter(**{f"{name}__isnull": True})
+        if key:
+            rollup = rollup.filter(**{f"{key}__in": {d[1] for d in deltas}})
+        for row in rollup:
+            delta = deltas.get(tuple(getattr(row, f) for f in fields))
+            if delta is None:
+                continue
+            row.orders -= delta["orders"]
+            # SQLite sums decimals as floats.
+            row.revenue = (row.revenue - Decimal(str(delta["revenue"] or 0))).quantize(CENTS)
+            (changed if row.orders > 0 else emptied).append(row)
+    OrderRollup.objects.bulk_update(changed, ["orders", "revenue"], batch_size=500)
+    OrderRollup.objects.filter(pk__in=[row.pk for row in emptied]).delete()
+
+
+# =====================================
+# Roll-up
+# =====================================
+def _orders_between(start, stop):
+    return Order.objects.filter(order_date__gte=midnight(start), order_date__lt=midnight(stop))
+
+
+def _insert_rollup(rows):
+    """INSERT ... SELECT the rows of a values() queryset into OrderRollup."""
+    qn = connection.ops.quote_name
+    columns = ", ".join(qn(name) for name in rows.query.selected)
+    sql, params = rows.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {qn(OrderRollup._meta.db_table)} ({columns}) "
+            f"SELECT {columns} FROM ({sql}) AS rollup",
+            params,
+        )
+
+
+def _roll_up_days(start, stop):
+    """Write the OrderRollup rows for the days from ``start`` up to ``stop``."""
+    orders = _orders_between(start, stop).annotate(day=TruncDate("order_date")).order_by()
+    totals = {"orders": Count("pk"), "revenue": Round(Sum("total_amount"), 2)}
+    _insert_rollup(orders.values("day").annotate(**totals))
+    _insert_rollup(orders.values("day", "customer_id").annotate(**totals))
+    # An order holds a product on one line only, so lines count orders.
+    lines = OrderLine.objects.filter(order__in=orders.values("pk")).annotate(
+        day=TruncDate("order__order_date")
+    ).order_by()
+    line_totals = {"orders": Count("pk"), "revenue": Round(Sum(LINE_TOTAL), 2)}
+    _insert_rollup(lines.values("day", "product_id").annotate(**line_totals))
+
+
+def roll_up(until=None, chunk_days=DEFAULT_CHUNK_DAYS):
+    """
+    Extend OrderRollup up to the day ``until`` (default today, the open
+    bucket, which is never rolled up).
+
+    Work starts at the high-water mark, or at the first order, and goes
+    ``chunk_days`` at a time, each chunk in its own transaction that
+    replaces the chunk's rows with three INSERT ... SELECT statements and
+    advances the mark, so the write lock is held for one chunk and an
+    interrupted run resumes where it stopped.
+    Returns the number of days rolled up.
+    """
+    until = until or today()
+    days = 0
+    while True:
+        with transaction.atomic():
+            state, _ = OrderRollupState.objects.select_for_update().get_or_create(pk=STATE_PK)
+            mark = state.high_water_mark
+            if mark is None:
+                mark = Order.objects.aggregate(first=Min("order_date"))["first"] or midnight(until)
+            start = min(timezone.localdate(mark), until)
+            if start >= until:
+                if state.high_water_mark is None:
+                    state.high_water_mark = midnight(until)
+                    state.save()
+                break
+            stop = min(start + timedelta(days=chunk_days), until)
+
+            # Rows from the mark on are stale: written before a rewind.
+            OrderRollup.objects.filter(day__gte=start).delete()
+            _roll_up_days(start, stop)
+            state.high_water_mark = midnight(stop)
+            state.save()
+            days += (stop - start).days
+    if days:
+        response_cache.bump_model_version(Order)
+    return days
+
+
+def reset():
+    """Drop the roll-up; the next roll_up() rebuilds it from the first order."""
+    with transaction.atomic():
+        OrderRollup.objects.all().delete()
+        OrderRollupState.objects.update_or_create(pk=STATE_PK, defaults={"high_water_mark": None})
+
+
+# =====================================
+# Queries
+# =====================================
+def period_totals(period="day", since=None, until=None, customer_id=None, product_id=None,
+                  breakdown=None, rank_by="revenue", top=None):
+    """
+    Orders and revenue per ``period`` bucket for the days ``since`` to
+    ``until`` (both inclusive, either open-ended), for one customer or
+    product if given, or per customer or product with ``breakdown``,
+    keeping the ``top`` best by ``rank_by`` in each bucket.
+
+    Days before the high-water mark come from OrderRollup; the rest, the
+    current open bucket in normal running, are grouped from the order
+    tables. Returns dicts with ``period`` (the bucket's first day),
+    ``customer_id``, ``product_id``, ``orders`` and ``revenue``, by period.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period '{period}'. Use one of: {', '.join(PERIODS)}.")
+    if breakdown not in (None, *BREAKDOWNS):
+        raise ValueError(f"Unknown breakdown '{breakdown}'. Use one of: {', '.join(BREAKDOWNS)}.")
+    if rank_by not in RANKS:
+        raise ValueError(f"Cannot rank by '{rank_by}'. Use one of: {', '.join(RANKS)}.")
+    dimension = breakdown or ("customer" if customer_id is not None else None) \
+        or ("product" if product_id is not None else None)
+    if (customer_id is not None and dimension != "customer") \
+            or (product_id is not None and dimension != "product"):
+        raise ValueError("Filter and break down by customer or by product, not both.")
+
+    stop = until + timedelta(days=1) if until is not None else None
+    # Rolled-up days end at the mark; the order tables cover the rest.
+    rolled = rolled_up_until()
+    if rolled is None:
+        rollup_stop, raw_start = None, since
+    else:
+        rollup_stop = rolled if stop is None else min(rolled, stop)
+        raw_start = rolled if since is None else max(rolled, since)
+
+    key = f"{dimension}_id" if dimension else None
+    fields = (key,) if key else ()
+    value = customer_id if customer_id is not None else product_id
+    buckets = defaultdict(lambda: {"orders": 0, "revenue": Decimal("0")})
+
+    def collect(rows):
+        for row in rows:
+            bucket = buckets[(row["period"], row[key] if key else None)]
+            bucket["orders"] += row["orders"]
+            bucket["revenue"] += row["revenue"] or 0
+
+    if rolled is not None and (since is None or since < rollup_stop):
+        rollup = OrderRollup.objects.filter(day__lt=rollup_stop)
+        if since is not None:
+            rollup = rollup.filter(day__gte=since)
+        for name in BREAKDOWNS:
+            rollup = rollup.filter(**{f"{name}__isnull": name != dimension})
+        if value is not None:
+            rollup = rollup.filter(**{key: value})
+        collect(
+            rollup.values(*fields, period=PERIODS[period](F("day")))
+            .annotate(orders=Sum("orders"), revenue=Sum("revenue")).order_by()
+        )
+
+    if stop is None or raw_start is None or raw_start < stop:
+        orders = Order.objects.all()
+        if raw_start is not None:
+            orders = orders.filter(order_date__gte=midnight(raw_start))
+        if stop is not None:
+            orders = orders.filter(order_date__lt=midnight(stop))
+        # Selecting the rows through the order_date index first keeps SQLite
+        # from walking a whole customer or product index for the GROUP BY.
+        if dimension == "product":
+            raw = OrderLine.objects.filter(order__in=orders.values("pk"))
+            day = TruncDate("order__order_date")
+            totals = {"orders": Count("pk"), "revenue": Round(Sum(LINE_TOTAL), 2)}
+        else:
+            raw = Order.objects.filter(pk__in=orders.values("pk"))
+            day = TruncDate("order_date")
+            totals = {"orders": Count("pk"), "revenue": Sum("total_amount")}
+        if value is not None:
+            raw = raw.filter(**{key: value})
+        collect(raw.values(*fields, period=PERIODS[period](day)).annotate(**totals).order_by())
+
+    results = [
+        {
+            "period": period_start,
+            "customer_id": dimension_id if dimension == "customer" else None,
+            "product_id": dimension_id if dimension == "product" else None,
+            "orders": totals["orders"],
+            # SQLite sums decimals as floats.
+            "revenue": totals["revenue"].quantize(CENTS),
+        }
+        for (period_start, dimension_id), totals in buckets.items()
+    ]
+    if top is not None and dimension:
+        by_period = defaultdict(list)
+        for row in results:
+            by_period[row["period"]].append(row)
+        results = [
+            row for rows in by_period.values()
+            for row in heapq.nlargest(top, rows, key=lambda r: r[rank_by])
+        ]
+    results.sort(key=lambda r: (r["period"], -r[rank_by]))
+    return results
@@ -0,0 +1,50 @@
+import asyncio
+from inspect import isawaitable
+
+from asgiref.sync import sync_to_async
+
+
+def on_event_loop():
+    """True when called from a coroutine, i.e. while the async view executes."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def run_sync(func, *args, **kwargs):
+    """
+    Call ``func`` directly, or hand it to the request's sync thread when
+    resolving on the event loop, where the ORM refuses to run.
+    """
+    if on_event_loop():
+        return sync_to_async(func)(*args, **kwargs)
+    return func(*args, **kwargs)
+
+
+async def iterate_async(iterable):
+    """
+    Iterate ``iterable``, which may use the ORM, from the event loop, each
+    item produced in the request's sync thread. Django's ASGI handler
+    reads a sync streaming body into memory before sending any of it.
+    """
+    iterator = iter(iterable)
+    done = object()
+    try:
+        while (item := await sync_to_async(next)(iterator, done)) is not done:
+            yield item
+    finally:
+        # A client that disconnects stops us early; free the cursor.
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            await sync_to_async(close)()
+
+
+def then(value, func):
+    """Apply ``func`` to ``value``, awaiting it first if it is awaitable."""
+    if isawaitable(value):
+        async def chained():
+            return func(await value)
+        return chained()
+    return func(value)
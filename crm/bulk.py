@@ -0,0 +1,94 @@
+import re
+from contextlib import nullcontext
+
+from django.db import IntegrityError, transaction
+
+from crm import response_cache, stats
+from crm.models import Customer
+
+PHONE_RE = re.compile(r"^\+?\d{3,15}$")
+
+# Keeps "email IN (...)" well under SQLite's bound-parameter limit.
+DEFAULT_CHUNK_SIZE = 500
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def insert_customers(customers):
+    """
+    bulk_create a validated chunk, dropping rows that lost an insert race.
+    Returns ``(created, emails taken meanwhile)``.
+    """
+    try:
+        with transaction.atomic():
+            return Customer.objects.bulk_create(customers), []
+    except IntegrityError:
+        taken = set(
+            Customer.objects.filter(email__in=[c.email for c in customers])
+            .values_list("email", flat=True)
+        )
+        remaining = [c for c in customers if c.email not in taken]
+        created = Customer.objects.bulk_create(remaining) if remaining else []
+        return created, sorted(taken)
+
+
+def bulk_create_customers(rows, chunk_size=DEFAULT_CHUNK_SIZE, commit_each_chunk=False):
+    """
+    Validate and insert customer rows set-wise.
+
+    ``rows`` is an iterable of mappings with name, email and phone keys.
+    Each chunk costs one SELECT for existing emails and one bulk INSERT.
+    With ``commit_each_chunk`` every chunk is its own transaction, so a long
+    import never holds the write lock for more than one chunk; otherwise the
+    whole import is atomic. Returns ``(created, errors)``.
+    """
+    created = []
+    errors = []
+    seen = set()
+    outer = nullcontext() if commit_each_chunk else transaction.atomic()
+
+    with outer:
+        for chunk in _chunks(rows, chunk_size):
+            candidates = []
+            for data in chunk:
+                email = data.get("email")
+                phone = data.get("phone")
+                if email in seen:
+                    errors.append(f"{email}: Duplicate email in input")
+                    continue
+                seen.add(email)
+                if phone and not PHONE_RE.match(phone):
+                    errors.append(f"{email}: Invalid phone format")
+                    continue
+                candidates.append(Customer(name=data.get("name"), email=email, phone=phone))
+
+            existing = set(
+                Customer.objects.filter(email__in=[c.email for c in candidates])
+                .values_list("email", flat=True)
+            )
+            errors.extend(f"{c.email}: Email already exists" for c in candidates if c.email in existing)
+            candidates = [c for c in candidates if c.email not in existing]
+            if not candidates:
+                continue
+
+            chunk_tx = transaction.atomic() if commit_each_chunk else nullcontext()
+            with chunk_tx:
+                inserted, lost = insert_customers(candidates)
+                # bulk_create skips post_save, so keep the stats row and the
+                # response cache in step here.
+                stats.adjust(customers=len(inserted))
+                if inserted:
+                    response_cache.bump_model_version(Customer)
+            created.extend(inserted)
+            errors.extend(f"{email}: Email already exists" for email in lost)
+
+    return created, errors
@@ -0,0 +1,69 @@
+import time
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Sum
+from django.db.models.functions import Coalesce
+
+from crm import analytics, response_cache, stats
+from crm.models import Customer, Order, OrderLine
+
+DEFAULT_INACTIVE_DAYS = 365
+DEFAULT_CLEANUP_CHUNK_SIZE = 500
+
+
+def inactive_customers(cutoff):
+    """Customers without an order on or after ``cutoff``, as one NOT EXISTS anti-join."""
+    recent = Order.objects.filter(customer=OuterRef("pk"), order_date__gte=cutoff)
+    return Customer.objects.filter(~Exists(recent))
+
+
+def delete_customers(customer_ids):
+    """
+    Delete customers together with their orders and order lines.
+
+    One DELETE per table instead of the collector's per-object cascade and
+    signals; the stats row, the analytics roll-up and the response cache
+    are adjusted here instead.
+    Returns ``(customers, orders)`` deleted.
+    """
+    orders = Order.objects.filter(customer_id__in=customer_ids)
+    totals = orders.aggregate(count=Count("pk"), revenue=Coalesce(Sum("total_amount"), Decimal("0")))
+    analytics.forget_orders(orders)
+    # _raw_delete is what the collector runs for fast deletes; it sends no signals.
+    lines = OrderLine.objects.filter(order__customer_id__in=customer_ids)
+    lines._raw_delete(lines.db)
+    orders._raw_delete(orders.db)
+    customers = Customer.objects.filter(pk__in=customer_ids)
+    deleted = customers._raw_delete(customers.db)
+
+    stats.adjust(customers=-deleted, orders=-totals["count"], revenue=-totals["revenue"])
+    response_cache.bump_model_version(Customer)
+    if totals["count"]:
+        response_cache.bump_model_version(Order)
+    return deleted, totals["count"]
+
+
+def delete_inactive_customers(cutoff, chunk_size=DEFAULT_CLEANUP_CHUNK_SIZE, pause=0):
+    """
+    Delete customers inactive since ``cutoff`` ``chunk_size`` at a time.
+
+    Customers are walked in primary-key order and each chunk is selected
+    and deleted in its own transaction, so the write lock is held for one
+    chunk only; ``pause`` seconds between chunks lets other writers in.
+    Yields ``(customers, orders)`` deleted per chunk.
+    """
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                inactive_customers(cutoff).filter(pk__gt=last_id)
+                .order_by("pk").values_list("pk", flat=True)[:chunk_size]
+            )
+            if not ids:
+                return
+            deleted = delete_customers(ids)
+        last_id = ids[-1]
+        yield deleted
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,179 @@
+from django.conf import settings
+from graphene_django.settings import graphene_settings
+from graphql import (
+    FieldNode, FragmentDefinitionNode, FragmentSpreadNode, GraphQLError, GraphQLList, GraphQLObjectType,
+    InlineFragmentNode, get_named_type, get_nullable_type,
+)
+from graphql.execution.values import get_argument_values
+from graphql.language import OperationType
+
+DEFAULTS = {
+    "MAX_DEPTH": 15,
+    "MAX_NODES": 10000,
+    "MAX_COST": 20000,
+    # Rows assumed for a top-level connection or list without first/last.
+    "DEFAULT_PAGE_SIZE": None,  # RELAY_CONNECTION_MAX_LIMIT
+    # Rows assumed per parent for a nested one (a customer's orders, an
+    # order's products), which is nearer a typical relation than a full page.
+    "NESTED_PAGE_SIZE": 10,
+    # Cost per object returned by a field, keyed "ParentType.field".
+    # Nested relations go through a join and a loader on every page.
+    "FIELD_WEIGHTS": {
+        "CustomerType.orders": 2,
+        "OrderType.products": 2,
+    },
+    "DEFAULT_WEIGHT": 1,
+    "MUTATION_WEIGHT": 10,
+    # Operations accepted in one batched POST (a JSON array of operations).
+    "MAX_BATCH_SIZE": 10,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "CRM_GRAPHQL_LIMITS", {})}
+
+
+class QueryTooComplex(GraphQLError):
+    pass
+
+
+def is_connection(graphql_type):
+    return isinstance(graphql_type, GraphQLObjectType) and "edges" in graphql_type.fields \
+        and "pageInfo" in graphql_type.fields
+
+
+class CostAnalysis:
+    """
+    Estimate what an operation will fetch from its document and variables.
+
+    Every object-typed field is charged for the objects it returns: one per
+    parent for a to-one field, the page size (``first``/``last``, else the
+    default page size at the top level and the nested page size below it)
+    per parent for connections and lists. A connection's rows are charged
+    once, on the connection; ``edges`` and ``node`` are only the wrapping.
+    ``nodes`` is the estimated number of objects, ``cost`` the same count
+    weighted per field, and ``depth`` the deepest field nesting.
+    """
+
+    def __init__(self, schema, document, variables=None, config=None):
+        self.schema = schema
+        self.variables = variables or {}
+        self.config = config or get_config()
+        self.page_size = self.config["DEFAULT_PAGE_SIZE"] or graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+        self.nested_page_size = self.config["NESTED_PAGE_SIZE"] or self.page_size
+        self.fragments = {
+            d.name.value: d for d in document.definitions if isinstance(d, FragmentDefinitionNode)
+        }
+        self.depth = 0
+        self.nodes = 0
+        self.cost = 0
+
+    def analyse(self, operation_ast):
+        root = self.schema.get_root_type(operation_ast.operation)
+        if root is None:
+            return self
+        weight = self.config["MUTATION_WEIGHT"] if operation_ast.operation == OperationType.MUTATION else 0
+        for node in self.fields(operation_ast.selection_set, root):
+            self.cost += weight
+            self.visit(node, root, 1, 1)
+        return self
+
+    def fields(self, selection_set, parent_type, seen=None):
+        """Field nodes of ``selection_set``, with fragments flattened."""
+        seen = set() if seen is None else seen
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                yield selection
+            elif isinstance(selection, InlineFragmentNode):
+                yield from self.fields(selection.selection_set, parent_type, seen)
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                if name not in seen and name in self.fragments:
+                    seen.add(name)
+                    yield from self.fields(self.fragments[name].selection_set, parent_type, seen)
+
+    def page_of(self, field_def, node, depth):
+        try:
+            args = get_argument_values(field_def, node, self.variables)
+        except GraphQLError:
+            args = {}
+        size = args.get("first") or args.get("last")
+        if isinstance(size, int):
+            return max(size, 0)
+        return self.page_size if depth == 1 else self.nested_page_size
+
+    def visit(self, node, parent_type, parents, depth):
+        self.depth = max(self.depth, depth)
+        field_def = getattr(parent_type, "fields", {}).get(node.name.value)
+        if field_def is None or node.selection_set is None:
+            return
+        field_type = get_nullable_type(field_def.type)
+        named = get_named_type(field_type)
+        weight = self.config["FIELD_WEIGHTS"].get(
+            f"{parent_type.name}.{node.name.value}", self.config["DEFAULT_WEIGHT"]
+        )
+
+        if is_connection(named):
+            count = parents * self.page_of(field_def, node, depth)
+            self.charge(count, weight)
+            # edges { node { ... } } repeats per row; other fields once per connection.
+            for child in self.fields(node.selection_set, named):
+                if child.name.value == "edges" and child.selection_set is not None:
+                    self.depth = max(self.depth, depth + 1)
+                    edge_type = get_named_type(named.fields["edges"].type)
+                    for edge_child in self.fields(child.selection_set, edge_type):
+                        if edge_child.name.value == "node" and edge_child.selection_set is not None:
+                            # The row itself, already charged above.
+                            self.depth = max(self.depth, depth + 2)
+                            node_type = get_named_type(edge_type.fields["node"].type)
+                            for row_child in self.fields(edge_child.selection_set, node_type):
+                                self.visit(row_child, node_type, count, depth + 3)
+                        else:
+                            self.visit(edge_child, edge_type, count, depth + 2)
+                else:
+                    self.visit(child, named, parents, depth + 1)
+            return
+
+        if isinstance(field_type, GraphQLList):
+            count = parents * self.page_of(field_def, node, depth)
+        else:
+            count = parents
+        if isinstance(named, GraphQLObjectType) and named.name != "PageInfo":
+            self.charge(count, weight)
+        for child in self.fields(node.selection_set, named):
+            self.visit(child, named, count, depth + 1)
+
+    def charge(self, count, weight):
+        self.nodes += count
+        self.cost += count * weight
+
+    def report(self):
+        return {
+            "depth": self.depth,
+            "nodes": self.nodes,
+            "cost": self.cost,
+            "maxDepth": self.config["MAX_DEPTH"],
+            "maxNodes": self.config["MAX_NODES"],
+            "maxCost": self.config["MAX_COST"],
+        }
+
+    def errors(self):
+        limits = (
+            ("depth", self.depth, self.config["MAX_DEPTH"]),
+            ("node count", self.nodes, self.config["MAX_NODES"]),
+            ("cost", self.cost, self.config["MAX_COST"]),
+        )
+        return [
+            QueryTooComplex(
+                f"Query {label} {value} exceeds the limit of {limit}.",
+                extensions={"code": "QUERY_TOO_COMPLEX"},
+            )
+            for label, value, limit in limits
+            if limit is not None and value > limit
+        ]
+
+
+def analyse_operation(schema, document, operation_ast, variables=None):
+    """Return ``(report, errors)`` for ``operation_ast``; errors are QueryTooComplex."""
+    analysis = CostAnalysis(schema, document, variables).analyse(operation_ast)
+    return analysis.report(), analysis.errors()
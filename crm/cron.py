@@ -1,8 +1,6 @@
 import datetime
-import gql
-import requests
-from gql.transport.requests import RequestsHTTPTransport
-from gql import Client, gql, Client
+
+from crm.executor import execute_graphql
 
 
 def log_crm_heartbeat():
@@ -16,15 +14,11 @@ def log_crm_heartbeat():
 
     # Optional: Check GraphQL endpoint health
     try:
-        response = requests.post(
-            "http://localhost:8000/graphql",
-            json={"query": "{ hello }"},
-            timeout=5
-        )
-        if response.status_code == 200:
+        result = execute_graphql("{ hello }")
+        if not result.get("errors"):
             print("✅ GraphQL endpoint is responsive.")
         else:
-            print("⚠️ GraphQL endpoint returned non-200 status.")
+            print("⚠️ GraphQL endpoint returned errors.")
     except Exception as e:
         print(f"❌ GraphQL check failed: {e}")
 
@@ -42,13 +36,9 @@ def update_low_stock():
     """
 
     try:
-        response = requests.post(
-            "http://localhost:8000/graphql",
-            json={"query": mutation},
-            timeout=10
-        )
-
-        data = response.json()
+        data = execute_graphql(mutation)
+        if data.get("errors"):
+            raise Exception(data["errors"][0]["message"])
         message = data.get("data", {}).get("updateLowStockProducts", {}).get("message", "No response.")
         products = data.get("data", {}).get("updateLowStockProducts", {}).get("updatedProducts", [])
 
@@ -64,3 +54,9 @@ def update_low_stock():
         with open("/tmp/low_stock_updates_log.txt", "a") as log_file:
             log_file.write(f"\n[{timestamp}] ❌ Error: {e}\n")
         print(f"❌ Failed to update stock: {e}")
+
+
+def send_order_reminders():
+    """Daily order reminders, as scheduled in CRONJOBS."""
+    from crm.cron_jobs.send_order_reminders import main
+    main()
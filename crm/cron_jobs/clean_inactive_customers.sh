@@ -7,20 +7,10 @@
 
 LOG_FILE="/tmp/customer_cleanup_log.txt"
 TIMESTAMP=$(date '+%Y-%m-%d %H:%M:%S')
+PROJECT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")/../.." && pwd)"
 
-# Run Django command inside shell
-DELETED_COUNT=$(python manage.py shell <<EOF
-from crm.models import Customer
-from django.utils import timezone
-from datetime import timedelta
-
-one_year_ago = timezone.now() - timedelta(days=365)
-inactive_customers = Customer.objects.filter(order__isnull=True) | Customer.objects.exclude(order__order_date__gte=one_year_ago)
-count = inactive_customers.count()
-inactive_customers.delete()
-print(count)
-EOF
-)
+# Deletes in chunks of 500, each committed on its own (see crm/cleanup.py)
+RESULT=$(cd "$PROJECT_DIR" && python manage.py clean_inactive_customers --days 365 --verbosity 0 2>&1)
 
 # Log the result
-echo "[$TIMESTAMP] Deleted $DELETED_COUNT inactive customers" >> $LOG_FILE
+echo "[$TIMESTAMP] $RESULT" >> $LOG_FILE
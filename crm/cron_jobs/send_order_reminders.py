@@ -1,62 +1,173 @@
 #!/usr/bin/env python3
 """
 send_order_reminders.py
-Queries the GraphQL endpoint for recent orders and logs reminders daily.
+Pages through the last 7 days of orders and logs one reminder per
+customer daily, checkpointing after every page so a failed run resumes
+where it stopped.
 """
 
-import requests
+import json
+import os
+import sys
 from datetime import datetime, timedelta
-from gql import gql, Client
 
-GRAPHQL_ENDPOINT = "http://localhost:8000/graphql"
-LOG_FILE = "/tmp/order_reminders_log.txt"
+if __name__ == "__main__":
+    # Run from cron as a plain script: make the project importable first.
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "alx_backend_graphql.settings")
+    import django
+    django.setup()
 
-# Define the date filter (orders within the last 7 days)
-seven_days_ago = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
+from crm.executor import execute_graphql
+
+LOG_FILE = "/tmp/order_reminders_log.txt"
+CHECKPOINT_FILE = "/tmp/order_reminders_checkpoint.jsonl"
+# graphene rejects a page over RELAY_CONNECTION_MAX_LIMIT (default 100).
+PAGE_SIZE = 100
+LOG_BUFFER_SIZE = 64 * 1024
 
-# GraphQL query
-query = f"""
-{{
-  allOrders(filter: {{ orderDateGte: "{seven_days_ago}" }}) {{
-    edges {{
-      node {{
+# Keyset pages ordered by id, so a saved cursor stays valid while new
+# orders arrive and every page costs the same however deep the run is.
+QUERY = """
+query Reminders($since: Date!, $first: Int!, $after: String) {
+  allOrders(orderDate_Gte: $since, orderBy: "id", keyset: true, first: $first, after: $after) {
+    pageInfo {
+      hasNextPage
+      endCursor
+    }
+    edges {
+      node {
         id
-        customer {{
-          email
-        }}
         orderDate
-      }}
-    }}
-  }}
-}}
+        customer {
+          id
+          email
+        }
+      }
+    }
+  }
+}
 """
 
-def log_message(message: str):
-    """Append a message with timestamp to the log file."""
-    timestamp = datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
-    with open(LOG_FILE, "a") as f:
-        f.write(f"{timestamp} {message}\n")
 
-def main():
+def fetch_pages(since, after=None, page_size=PAGE_SIZE):
+    """Yield ``(edges, end_cursor)`` one page at a time."""
+    while True:
+        data = execute_graphql(QUERY, {"since": since, "first": page_size, "after": after})
+        if data.get("errors"):
+            raise Exception(data["errors"][0]["message"])
+        connection = data["data"]["allOrders"]
+        after = connection["pageInfo"]["endCursor"]
+        yield connection["edges"], after
+        if not connection["pageInfo"]["hasNextPage"]:
+            return
+
+
+def load_checkpoint(since):
+    """
+    The state of an unfinished run over the same window, if any, replayed
+    from its journal: a header line with the window, then one line per
+    page. A line cut short by a crash is ignored, and so is its page.
+    """
+    try:
+        with open(CHECKPOINT_FILE) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    checkpoint = None
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            break
+        if checkpoint is None:
+            if entry.get("since") != since:
+                return None
+            checkpoint = {"since": since, "after": None, "customers": [], "orders": 0}
+            continue
+        checkpoint["after"] = entry["after"]
+        checkpoint["orders"] = entry["orders"]
+        checkpoint["customers"].extend(entry["customers"])
+    return checkpoint
+
+
+class CheckpointJournal:
+    """
+    Appends one line per page with the cursor and only the customers
+    reminded on that page, so a checkpoint costs the page's size rather
+    than the size of the whole run so far.
+    """
+
+    def __init__(self, checkpoint):
+        resuming = checkpoint["after"] is not None
+        self.file = open(CHECKPOINT_FILE, "a" if resuming else "w")
+        if not resuming:
+            self._append({"since": checkpoint["since"]})
+
+    def _append(self, entry):
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def save(self, after, orders, new_customers):
+        self._append({"after": after, "orders": orders, "customers": new_customers})
+
+    def close(self):
+        self.file.close()
+
+
+def clear_checkpoint():
     try:
-        response = requests.post(GRAPHQL_ENDPOINT, json={"query": query})
-        response.raise_for_status()
-        data = response.json()
-
-        orders = data.get("data", {}).get("allOrders", {}).get("edges", [])
-        if not orders:
-            log_message("No recent orders found.")
-        else:
-            for order in orders:
-                node = order.get("node", {})
-                order_id = node.get("id")
-                email = node.get("customer", {}).get("email", "unknown")
-                log_message(f"Reminder: Order ID {order_id} → Customer {email}")
-
-        print("Order reminders processed!")
-    except Exception as e:
-        log_message(f"Error: {e}")
-        print("Error occurred while processing order reminders.")
+        os.remove(CHECKPOINT_FILE)
+    except FileNotFoundError:
+        pass
+
+
+def main():
+    # Orders within the last 7 days
+    since = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
+    checkpoint = load_checkpoint(since) or {"since": since, "after": None, "customers": [], "orders": 0}
+    reminded = set(checkpoint["customers"])
+
+    with open(LOG_FILE, "a", buffering=LOG_BUFFER_SIZE) as log:
+        def log_message(message):
+            timestamp = datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
+            log.write(f"{timestamp} {message}\n")
+
+        journal = CheckpointJournal(checkpoint)
+        try:
+            if checkpoint["after"]:
+                log_message(f"Resuming after {checkpoint['orders']} orders.")
+            for edges, end_cursor in fetch_pages(since, checkpoint["after"]):
+                new_customers = []
+                for edge in edges:
+                    node = edge["node"]
+                    customer = node.get("customer") or {}
+                    checkpoint["orders"] += 1
+                    # One reminder per customer, however many orders they placed.
+                    if customer.get("id") in reminded:
+                        continue
+                    reminded.add(customer.get("id"))
+                    new_customers.append(customer.get("id"))
+                    email = customer.get("email", "unknown")
+                    log_message(f"Reminder: Order ID {node.get('id')} → Customer {email}")
+
+                # Log lines reach the file before the checkpoint moves past
+                # them, so a crash repeats at most one page of reminders.
+                log.flush()
+                journal.save(end_cursor, checkpoint["orders"], new_customers)
+
+            if not checkpoint["orders"]:
+                log_message("No recent orders found.")
+            journal.close()
+            clear_checkpoint()
+            print("Order reminders processed!")
+        except Exception as e:
+            log_message(f"Error: {e}")
+            print("Error occurred while processing order reminders.")
+        finally:
+            journal.close()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+DEFAULTS = {
+    "ENABLED": False,
+    # Run on every new SQLite connection, in this order.
+    "PRAGMAS": {
+        # Readers no longer wait for writers, and commits append to the WAL
+        # instead of rewriting pages; NORMAL only fsyncs at checkpoints.
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        # Negative sizes are KiB: a 64 MB page cache per connection.
+        "cache_size": -65536,
+        "mmap_size": 268435456,
+        # Milliseconds a writer waits for the lock before "database is locked".
+        "busy_timeout": 5000,
+        "temp_store": "MEMORY",
+    },
+}
+
+
+def get_config():
+    config = {**DEFAULTS, **getattr(settings, "CRM_SQLITE", {})}
+    config["PRAGMAS"] = {**DEFAULTS["PRAGMAS"], **config["PRAGMAS"]}
+    return config
+
+
+def apply_pragmas(connection, pragmas):
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    config = get_config()
+    if config["ENABLED"]:
+        apply_pragmas(connection, config["PRAGMAS"])
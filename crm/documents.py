@@ -0,0 +1,136 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from graphql import GraphQLError, parse
+from graphql.validation import validate
+
+DEFAULT_DOCUMENT_CACHE_SIZE = 256
+PERSISTED_QUERY_TIMEOUT = 60 * 60 * 24 * 7
+
+
+def document_hash(query):
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+# =====================================
+# Parsed / validated document cache
+# =====================================
+class DocumentCache:
+    """
+    Process-local LRU of parsed and validated GraphQL documents.
+
+    Entries are keyed by the sha256 of the query text plus the schema and
+    validation rules they were checked against, so a hit skips both
+    parse() and validate().
+    """
+
+    def __init__(self, maxsize=DEFAULT_DOCUMENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, schema, query, validation_rules=None, max_errors=None):
+        """Return ``(document, validation_errors)``; parse errors propagate."""
+        key = (document_hash(query), id(schema), tuple(validation_rules or ()))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        document = parse(query)
+        errors = validate(schema, document, validation_rules, max_errors)
+        entry = (document, errors)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        return {"size": size, "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+document_cache = DocumentCache(
+    getattr(settings, "CRM_GRAPHQL_DOCUMENT_CACHE_SIZE", DEFAULT_DOCUMENT_CACHE_SIZE)
+)
+
+
+# =====================================
+# Automatic persisted queries
+# =====================================
+class PersistedQueryError(GraphQLError):
+    pass
+
+
+class PersistedQueryStore:
+    """
+    Automatic persisted-query (APQ) registry: clients send
+    ``extensions.persistedQuery.sha256Hash`` and only include the query
+    text when the server answers PersistedQueryNotFound. Hashes live in a
+    Django cache so every worker shares them.
+    """
+    key_prefix = "crm:apq:"
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.registered = 0
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, "CRM_GRAPHQL_PERSISTED_QUERY_CACHE", "default")]
+
+    def resolve(self, query, extensions):
+        """Return the query text for a request, registering new hashes."""
+        persisted = (extensions or {}).get("persistedQuery")
+        if not persisted:
+            return query
+        if not isinstance(persisted, dict):
+            raise PersistedQueryError("persistedQuery must be an object.")
+        if persisted.get("version") != 1:
+            raise PersistedQueryError(
+                "Unsupported persisted query version.",
+                extensions={"code": "PERSISTED_QUERY_NOT_SUPPORTED"},
+            )
+        sha = persisted.get("sha256Hash")
+        if not isinstance(sha, str):
+            raise PersistedQueryError("persistedQuery.sha256Hash must be a string.")
+        if query:
+            if not isinstance(query, str):
+                raise PersistedQueryError("query must be a string.")
+            if document_hash(query) != sha:
+                raise PersistedQueryError("provided sha does not match query")
+            self.cache.set(self.key_prefix + sha, query, PERSISTED_QUERY_TIMEOUT)
+            self.registered += 1
+            return query
+
+        query = self.cache.get(self.key_prefix + sha)
+        if query is None:
+            self.misses += 1
+            raise PersistedQueryError(
+                "PersistedQueryNotFound", extensions={"code": "PERSISTED_QUERY_NOT_FOUND"}
+            )
+        self.hits += 1
+        return query
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "registered": self.registered}
+
+
+persisted_queries = PersistedQueryStore()
@@ -0,0 +1,109 @@
+from types import SimpleNamespace
+
+import requests
+from django.conf import settings
+from django.db import connection, transaction
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView, instantiate_middleware
+from graphql import GraphQLError, OperationType, execute, get_operation_ast
+
+from crm.documents import document_cache
+from crm.routing import route_operation
+
+DEFAULTS = {
+    # "local" runs documents against the schema in this process; "http"
+    # POSTs them to URL, for jobs deployed apart from the database.
+    "TRANSPORT": "local",
+    "URL": "http://localhost:8000/graphql",
+    "TIMEOUT": 10,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "CRM_GRAPHQL_JOBS", {})}
+
+
+def execute_local(query, variables=None, operation_name=None):
+    """
+    Run ``query`` against the project schema and return the dict the HTTP
+    endpoint would have sent as JSON.
+
+    Parsing and validation share the view's document cache, mutations
+    follow the same ATOMIC_MUTATIONS rule as the view, and queries read
+    from the replica the same way (crm.routing).
+    """
+    schema = graphene_settings.SCHEMA.graphql_schema
+    try:
+        document, errors = document_cache.get(
+            schema, query, None, graphene_settings.MAX_VALIDATION_ERRORS
+        )
+    except GraphQLError as e:
+        errors = [e]
+    if errors:
+        return {"errors": [GraphQLView.format_error(e) for e in errors]}
+
+    operation_ast = get_operation_ast(document, operation_name)
+    # Stands in for the request: loaders and other per-request state attach here.
+    context = SimpleNamespace()
+    options = {
+        "context_value": context,
+        "variable_values": variables,
+        "operation_name": operation_name,
+        "middleware": list(instantiate_middleware(graphene_settings.MIDDLEWARE)),
+    }
+    operation_type = operation_ast.operation.value if operation_ast is not None else "unknown"
+    with route_operation(operation_type):
+        if (
+            operation_ast is not None
+            and operation_ast.operation == OperationType.MUTATION
+            and (
+                graphene_settings.ATOMIC_MUTATIONS is True
+                or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+            )
+        ):
+            with transaction.atomic():
+                result = execute(schema, document, **options)
+                if getattr(context, MUTATION_ERRORS_FLAG, False) is True:
+                    transaction.set_rollback(True)
+        else:
+            result = execute(schema, document, **options)
+
+    response = {}
+    if result.errors:
+        response["errors"] = [GraphQLView.format_error(e) for e in result.errors]
+        if any(not getattr(e, "path", None) for e in result.errors):
+            return response
+    response["data"] = result.data
+    return response
+
+
+def execute_http(query, variables=None, operation_name=None):
+    """POST ``query`` to the configured GraphQL URL and return the decoded body."""
+    config = get_config()
+    response = requests.post(
+        config["URL"],
+        json={"query": query, "variables": variables, "operationName": operation_name},
+        timeout=config["TIMEOUT"],
+    )
+    return response.json()
+
+
+TRANSPORTS = {
+    "local": execute_local,
+    "http": execute_http,
+}
+
+
+def execute_graphql(query, variables=None, operation_name=None):
+    """
+    Run a GraphQL document for a cron job or Celery task through the
+    configured transport. Both return ``{"data": ..., "errors": [...]}``
+    shaped like the endpoint's JSON body.
+    """
+    transport = get_config()["TRANSPORT"]
+    try:
+        run = TRANSPORTS[transport]
+    except KeyError:
+        raise ValueError(f"Unknown CRM_GRAPHQL_JOBS transport: {transport!r}")
+    return run(query, variables, operation_name)
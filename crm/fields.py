@@ -0,0 +1,95 @@
+import graphene
+from django.db.models import Manager, QuerySet
+from graphene.types.argument import to_arguments
+from graphene_django.filter import DjangoFilterConnectionField
+
+from crm.async_utils import on_event_loop, run_sync
+from crm.loaders import get_loaders
+from crm.optimizer import PAGINATION_ARGS, optimize_queryset
+from crm.pagination import keyset_connection, stable_ordering
+
+
+def has_filter_args(args):
+    """True if any non-pagination argument was supplied."""
+    return any(v is not None for k, v in args.items() if k not in PAGINATION_ARGS)
+
+
+def is_prefetched(instance, relation):
+    """True if ``relation`` was filled by prefetch_related()."""
+    return relation in getattr(instance, "_prefetched_objects_cache", {})
+
+
+class CountableConnection(graphene.relay.Connection):
+    """Relay connection with a totalCount that is only counted when selected."""
+
+    class Meta:
+        abstract = True
+
+    total_count = graphene.Int()
+
+    def resolve_total_count(self, info):
+        if self.length is not None:
+            return self.length
+        if on_event_loop():
+            return self.iterable.acount()
+        return self.iterable.count()
+
+
+class BatchedFilterConnectionField(DjangoFilterConnectionField):
+    """
+    DjangoFilterConnectionField that cooperates with crm.loaders.
+
+    Once a page has been sliced, its nodes are handed to the request's
+    loaders so that nested relations of the whole page load in one query
+    each. Resolvers may also return a plain list (already loaded by a
+    loader), which is paginated as-is instead of being re-filtered.
+    Querysets are planned against the client's selection set, see
+    crm.optimizer.
+
+    ``keyset: true`` switches a query to keyset pagination (see
+    crm.pagination), ordered by ``orderBy`` with the id as tiebreaker.
+
+    On the async view the page is fetched in the request's sync thread, so
+    the event loop is free while the database works.
+    """
+
+    def __init__(self, type_, *args, order_by=None, **kwargs):
+        kwargs.setdefault("keyset", graphene.Boolean(default_value=False))
+        super().__init__(type_, *args, **kwargs)
+        # DjangoFilterConnectionField swallows order_by; expose it as an argument.
+        if order_by is not None:
+            self.args = to_arguments(self._base_args or {}, {"order_by": order_by})
+
+    @classmethod
+    def resolve_queryset(cls, connection, iterable, info, args, filtering_args, filterset_class):
+        if not isinstance(iterable, (QuerySet, Manager)):
+            return iterable
+        qs = super().resolve_queryset(
+            connection, iterable, info, args, filtering_args, filterset_class
+        )
+        # Joins planned by the optimizer must not change page contents.
+        return optimize_queryset(stable_ordering(qs), info)
+
+    @classmethod
+    def resolve_connection(cls, connection, args, iterable, max_limit=None):
+        if args.get("keyset") and isinstance(iterable, QuerySet):
+            return keyset_connection(connection, iterable, args, max_limit=max_limit)
+        return super().resolve_connection(connection, args, iterable, max_limit=max_limit)
+
+    @classmethod
+    def connection_resolver(cls, resolver, connection, default_manager, queryset_resolver,
+                            max_limit, enforce_first_or_last, root, info, **args):
+        return run_sync(
+            cls.resolve_page, resolver, connection, default_manager, queryset_resolver,
+            max_limit, enforce_first_or_last, root, info, **args
+        )
+
+    @classmethod
+    def resolve_page(cls, resolver, connection, default_manager, queryset_resolver,
+                     max_limit, enforce_first_or_last, root, info, **args):
+        result = super().connection_resolver(
+            resolver, connection, default_manager, queryset_resolver,
+            max_limit, enforce_first_or_last, root, info, **args
+        )
+        get_loaders(info.context).enqueue(edge.node for edge in result.edges)
+        return result
@@ -1,19 +1,20 @@
 import django_filters
+from graphene.utils.str_converters import to_snake_case
 from crm.models import Customer, Product, Order
 
 class CustomerFilter(django_filters.FilterSet):
     name = django_filters.CharFilter(field_name="name", lookup_expr="icontains")
     email = django_filters.CharFilter(field_name="email", lookup_expr="icontains")
-    created_at__gte = django_filters.DateFilter(field_name="created_at", lookup_expr="gte")
-    created_at__lte = django_filters.DateFilter(field_name="created_at", lookup_expr="lte")
     phone_pattern = django_filters.CharFilter(method="filter_phone_pattern")
 
+    order_by_fields = ("id", "name", "email")
+
     def filter_phone_pattern(self, queryset, name, value):
         return queryset.filter(phone__startswith=value)
 
     class Meta:
         model = Customer
-        fields = ["name", "email", "created_at", "phone"]
+        fields = ["name", "email", "phone"]
 
 class ProductFilter(django_filters.FilterSet):
     name = django_filters.CharFilter(field_name="name", lookup_expr="icontains")
@@ -22,6 +23,8 @@ class ProductFilter(django_filters.FilterSet):
     stock__gte = django_filters.NumberFilter(field_name="stock", lookup_expr="gte")
     stock__lte = django_filters.NumberFilter(field_name="stock", lookup_expr="lte")
 
+    order_by_fields = ("id", "name", "price", "stock")
+
     class Meta:
         model = Product
         fields = ["name", "price", "stock"]
@@ -32,9 +35,25 @@ class OrderFilter(django_filters.FilterSet):
     order_date__gte = django_filters.DateFilter(field_name="order_date", lookup_expr="gte")
     order_date__lte = django_filters.DateFilter(field_name="order_date", lookup_expr="lte")
     customer_name = django_filters.CharFilter(field_name="customer__name", lookup_expr="icontains")
-    product_name = django_filters.CharFilter(field_name="product__name", lookup_expr="icontains")
-    product_id = django_filters.NumberFilter(field_name="product__id", lookup_expr="exact")
+    # Several of an order's products can match; list the order once.
+    product_name = django_filters.CharFilter(
+        field_name="products__name", lookup_expr="icontains", distinct=True
+    )
+    product_id = django_filters.NumberFilter(field_name="products__id", lookup_expr="exact")
+
+    order_by_fields = ("id", "order_date", "total_amount")
 
     class Meta:
         model = Order
         fields = ["total_amount", "order_date", "customer_name", "product_name"]
+
+
+def apply_order_by(queryset, order_by, filterset_class):
+    """Order ``queryset`` by ``order_by`` if the filter set allows that field."""
+    if not order_by:
+        return queryset
+    order_by = to_snake_case(order_by)
+    if order_by.lstrip("-") not in filterset_class.order_by_fields:
+        allowed = ", ".join(filterset_class.order_by_fields)
+        raise Exception(f"Cannot order by '{order_by}'. Allowed fields: {allowed}.")
+    return queryset.order_by(order_by)
@@ -0,0 +1,48 @@
+from django.db import transaction
+from django.db.models import F
+
+from crm import response_cache
+from crm.models import Product
+
+DEFAULT_LOW_STOCK_THRESHOLD = 10
+DEFAULT_RESTOCK_INCREMENT = 10
+DEFAULT_RESTOCK_CHUNK_SIZE = 1000
+
+
+def restock_low_stock(threshold=DEFAULT_LOW_STOCK_THRESHOLD,
+                      increment=DEFAULT_RESTOCK_INCREMENT,
+                      chunk_size=DEFAULT_RESTOCK_CHUNK_SIZE):
+    """
+    Add ``increment`` to the stock of every product below ``threshold``.
+
+    Products are walked in primary-key order, ``chunk_size`` at a time. Each
+    chunk is one locking id SELECT, one ``UPDATE ... SET stock = stock + n``
+    of exactly those rows and one read of their new levels, committed on
+    its own so the write lock is released between chunks. Returns a list
+    of ``(name, stock)`` pairs.
+    """
+    updated = []
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            # The selected rows stay locked until the chunk commits, so each
+            # is still below the threshold when the UPDATE runs and the
+            # read-back lists only rows that were restocked. SQLite ignores
+            # FOR UPDATE, but a write committed after this SELECT makes the
+            # transaction's UPDATE fail rather than act on a stale row.
+            ids = list(
+                Product.objects.select_for_update()
+                .filter(stock__lt=threshold, pk__gt=last_id)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            Product.objects.filter(pk__in=ids).update(stock=F("stock") + increment)
+            # update() sends no post_save.
+            response_cache.bump_model_version(Product)
+            updated.extend(
+                Product.objects.filter(pk__in=ids).order_by("pk").values_list("name", "stock")
+            )
+        last_id = ids[-1]
+    return updated
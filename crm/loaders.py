@@ -0,0 +1,134 @@
+from collections import defaultdict
+
+from crm.models import Customer, Order, OrderLine
+
+
+# =====================================
+# Request-scoped batch loaders
+# =====================================
+class BatchLoader:
+    """
+    Synchronous batch loader.
+
+    Keys are queued as soon as the parent objects of a page are known, and
+    the first load() that misses the cache fetches every queued key in a
+    single query. Results are cached for the lifetime of the loader, which
+    is one request. Loaded objects are passed on to ``owner`` so that their
+    own relations are batched in turn.
+    """
+    parent_model = None
+
+    def __init__(self, owner=None):
+        self.owner = owner
+        self._cache = {}
+        self._queue = set()
+
+    def key_for(self, parent):
+        return parent.pk
+
+    def batch_load(self, keys):
+        """Return a dict mapping every key in ``keys`` to its value."""
+        raise NotImplementedError
+
+    def default(self):
+        return None
+
+    def enqueue(self, keys):
+        self._queue.update(k for k in keys if k is not None and k not in self._cache)
+
+    def load(self, key):
+        if key not in self._cache:
+            self._queue.add(key)
+            self._flush()
+        return self._cache[key]
+
+    def load_many(self, keys):
+        self.enqueue(keys)
+        return [self.load(key) for key in keys]
+
+    def prime(self, key, value):
+        self._cache[key] = value
+        self._queue.discard(key)
+
+    def _flush(self):
+        keys = list(self._queue)
+        self._queue.clear()
+        results = self.batch_load(keys)
+        for key in keys:
+            self._cache[key] = results.get(key, self.default())
+        if self.owner is not None:
+            loaded = []
+            for value in results.values():
+                loaded.extend(value if isinstance(value, list) else [value])
+            self.owner.enqueue(loaded)
+
+
+class CustomerLoader(BatchLoader):
+    """Order.customer, keyed by customer_id."""
+    parent_model = Order
+
+    def key_for(self, order):
+        # Never trigger a deferred-field load just to queue a key.
+        return order.__dict__.get("customer_id")
+
+    def batch_load(self, keys):
+        return Customer.objects.in_bulk(keys)
+
+
+class OrderProductsLoader(BatchLoader):
+    """Order.products, keyed by order id."""
+    parent_model = Order
+
+    def default(self):
+        return []
+
+    def batch_load(self, keys):
+        rows = OrderLine.objects.filter(order_id__in=keys).select_related("product")
+        results = defaultdict(list)
+        for row in rows.order_by("product_id"):
+            results[row.order_id].append(row.product)
+        return results
+
+
+class CustomerOrdersLoader(BatchLoader):
+    """Customer.orders, keyed by customer id."""
+    parent_model = Customer
+
+    def default(self):
+        return []
+
+    def batch_load(self, keys):
+        results = defaultdict(list)
+        for order in Order.objects.filter(customer_id__in=keys).order_by("id"):
+            results[order.customer_id].append(order)
+        return results
+
+
+class Loaders:
+    """The set of loaders attached to a single request."""
+
+    def __init__(self):
+        self.customer = CustomerLoader(self)
+        self.order_products = OrderProductsLoader(self)
+        self.customer_orders = CustomerOrdersLoader(self)
+
+    def __iter__(self):
+        return iter((self.customer, self.order_products, self.customer_orders))
+
+    def enqueue(self, parents):
+        """Queue the relation keys of a freshly resolved page of objects."""
+        parents = list(parents)
+        for loader in self:
+            keys = [loader.key_for(p) for p in parents if isinstance(p, loader.parent_model)]
+            loader.enqueue(keys)
+
+
+def get_loaders(context):
+    """Return the loaders bound to ``context``, creating them on first use."""
+    if context is None:
+        return Loaders()
+    loaders = getattr(context, "crm_loaders", None)
+    if loaders is None:
+        loaders = Loaders()
+        context.crm_loaders = loaders
+    return loaders
@@ -0,0 +1,182 @@
+import os
+import re
+import warnings
+
+from django.core.exceptions import FieldDoesNotExist, FieldError
+from django.core.management.base import BaseCommand
+from django.db import connection, models
+from django.db.migrations import AddIndex, Migration
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+import django_filters
+
+from crm.filters import CustomerFilter, OrderFilter, ProductFilter
+
+FILTERSETS = (CustomerFilter, ProductFilter, OrderFilter)
+
+# Lookups a B-tree index can serve. Leading-wildcard LIKE (icontains) and
+# case-insensitive prefix matches cannot use one.
+INDEXABLE_LOOKUPS = {"exact", "gt", "gte", "lt", "lte", "in", "range", "isnull"}
+
+# A plan line that reads a whole table (SQLite, PostgreSQL, MySQL).
+FULL_SCAN_RE = re.compile(r"\bSCAN (?!.*\bUSING\b.*\bINDEX\b)(?!.*INTEGER PRIMARY KEY)|Seq Scan|type: ALL", re.I)
+TEMP_SORT_RE = re.compile(r"USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY|Sort Key|Using filesort", re.I)
+
+
+def sample_value(filter_):
+    if isinstance(filter_, django_filters.NumberFilter):
+        return "1"
+    if isinstance(filter_, django_filters.DateTimeFilter):
+        return "2024-01-01T00:00:00+00:00"
+    if isinstance(filter_, django_filters.DateFilter):
+        return "2024-01-01"
+    return "a"
+
+
+def resolve_path(model, path):
+    """Follow ``a__b__c`` to ``(model, field)`` for the final column."""
+    parts = path.split("__")
+    for part in parts[:-1]:
+        model = model._meta.get_field(part).related_model
+    return model, model._meta.get_field(parts[-1])
+
+
+def indexed_prefixes(model):
+    """Column tuples already served by an index on ``model``."""
+    covered = {(model._meta.pk.name,)}
+    for field in model._meta.concrete_fields:
+        if field.unique:
+            # Unique values never need the pk tiebreaker.
+            covered.update({(field.name,), (field.name, model._meta.pk.name)})
+        elif field.db_index:
+            covered.add((field.name,))
+    for index in model._meta.indexes:
+        fields = tuple(f.lstrip("-") for f in index.fields)
+        for i in range(1, len(fields) + 1):
+            covered.add(fields[:i])
+    for fields in model._meta.unique_together:
+        for i in range(1, len(fields) + 1):
+            covered.add(tuple(fields[:i]))
+    return covered
+
+
+def plan_text(queryset):
+    try:
+        return queryset.explain()
+    except (FieldError, ValueError) as e:
+        return f"ERROR: {e}"
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN every declared CRM filter and allowed order_by field, report "
+        "full table scans, and suggest (or emit a migration for) matching indexes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--emit-migration", action="store_true",
+            help="Write a crm migration adding the suggested indexes.",
+        )
+        parser.add_argument("--verbose-plans", action="store_true", help="Print every query plan.")
+
+    def handle(self, *args, **options):
+        with warnings.catch_warnings():
+            # Date filters on DateTimeFields warn about naive sample values.
+            warnings.simplefilter("ignore", RuntimeWarning)
+            suggestions = self.analyse(options["verbose_plans"])
+
+        indexes = self.missing_indexes(suggestions)
+        self.stdout.write(self.style.MIGRATE_HEADING("Suggested indexes"))
+        if not indexes:
+            self.stdout.write("  none, every indexable filter and ordering is covered")
+            return
+        for model, index in indexes:
+            self.stdout.write(f"  {model.__name__}: models.Index(fields={list(index.fields)!r}, name={index.name!r})")
+
+        if options["emit_migration"]:
+            path = self.write_migration(indexes)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {path}"))
+            self.stdout.write("Add the indexes above to the models' Meta.indexes to keep makemigrations in step.")
+
+    def analyse(self, verbose):
+        """EXPLAIN every filter and ordering; return wanted column tuples per model."""
+        suggestions = {}
+        for filterset_class in FILTERSETS:
+            model = filterset_class._meta.model
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{filterset_class.__name__} ({model.__name__})"))
+
+            for name, filter_ in filterset_class.base_filters.items():
+                data = {name: sample_value(filter_)}
+                filterset = filterset_class(data=data, queryset=model.objects.all())
+                if not filterset.is_valid():
+                    self.stdout.write(f"  {name}: skipped, sample value rejected")
+                    continue
+                try:
+                    plan = plan_text(filterset.qs)
+                except FieldError as e:
+                    # Raised while building the queryset, before EXPLAIN.
+                    plan = f"ERROR: {e}"
+                self.report(f"filter {name}", plan, verbose, scan_is_bad=True)
+
+                if filter_.method or filter_.lookup_expr not in INDEXABLE_LOOKUPS:
+                    continue
+                try:
+                    target, field = resolve_path(model, filter_.field_name)
+                except (FieldDoesNotExist, AttributeError):
+                    continue
+                if field.concrete and not field.is_relation:
+                    suggestions.setdefault(target, set()).add((field.name,))
+
+            for name in filterset_class.order_by_fields:
+                field = model._meta.get_field(name)
+                for term, tiebreak in ((name, "pk"), (f"-{name}", "-pk")):
+                    plan = plan_text(model.objects.order_by(term, tiebreak)[:20])
+                    # Walking the table in index order under LIMIT is fine; a sort is not.
+                    self.report(f"order_by {term}", plan, verbose, scan_is_bad=False)
+                if not field.primary_key:
+                    suggestions.setdefault(model, set()).add((name, model._meta.pk.name))
+        return suggestions
+
+    def report(self, label, plan, verbose, scan_is_bad):
+        if plan.startswith("ERROR"):
+            self.stdout.write(self.style.ERROR(f"  {label}: {plan}"))
+        elif scan_is_bad and FULL_SCAN_RE.search(plan):
+            self.stdout.write(self.style.WARNING(f"  {label}: full table scan"))
+        elif TEMP_SORT_RE.search(plan):
+            self.stdout.write(self.style.WARNING(f"  {label}: sorts without an index"))
+        else:
+            self.stdout.write(f"  {label}: ok")
+        if verbose:
+            for line in plan.splitlines():
+                self.stdout.write(f"      {line}")
+
+    def missing_indexes(self, suggestions):
+        indexes = []
+        for model, wanted in suggestions.items():
+            covered = indexed_prefixes(model)
+            # A composite index also serves lookups on its leading column.
+            prefixes = {fields[:1] for fields in wanted if len(fields) > 1}
+            for fields in sorted(wanted):
+                if fields in covered or (len(fields) == 1 and fields in prefixes):
+                    continue
+                index = models.Index(fields=list(fields))
+                index.set_name_with_model(model)
+                indexes.append((model, index))
+        return indexes
+
+    def write_migration(self, indexes):
+        loader = MigrationLoader(connection, ignore_no_migrations=True)
+        leaves = loader.graph.leaf_nodes("crm")
+        number = int(leaves[0][1].split("_")[0]) + 1 if leaves else 1
+        name = f"{number:04d}_filter_indexes"
+
+        migration = Migration(name, "crm")
+        migration.dependencies = leaves
+        migration.operations = [
+            AddIndex(model_name=model._meta.model_name, index=index) for model, index in indexes
+        ]
+        writer = MigrationWriter(migration)
+        with open(writer.path, "w") as fh:
+            fh.write(writer.as_string())
+        return os.path.relpath(writer.path)
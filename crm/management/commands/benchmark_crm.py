@@ -0,0 +1,282 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from crm.models import Customer, Order, Product
+from crm.pagination import encode_cursor
+from crm.seeding import seed_orders
+
+SCALES = {"1k": 1000, "100k": 100000, "1m": 1000000}
+
+
+# =====================================
+# Benchmarked operations
+# =====================================
+def all_orders_filtered(state, i):
+    since = (timezone.now() - timedelta(days=90)).date().isoformat()
+    return """
+    {
+      allOrders(first: 50, orderDate_Gte: "%s", totalAmount_Gte: 100, orderBy: "-order_date") {
+        totalCount
+        edges { node { id totalAmount orderDate customer { name email } products(first: 10) { edges { node { name price } } } } }
+      }
+    }""" % since
+
+
+def all_customers_first_page(state, i):
+    return """
+    {
+      allCustomers(first: 100) {
+        totalCount
+        pageInfo { hasNextPage endCursor }
+        edges { node { id name email } }
+      }
+    }"""
+
+
+def all_customers_offset_deep(state, i):
+    return """
+    {
+      allCustomers(first: 100, offset: %d) {
+        pageInfo { hasNextPage endCursor }
+        edges { node { id name email } }
+      }
+    }""" % (state["customers"] // 2)
+
+
+def all_customers_keyset_deep(state, i):
+    return """
+    {
+      allCustomers(first: 100, keyset: true, after: "%s") {
+        pageInfo { hasNextPage endCursor }
+        edges { node { id name email } }
+      }
+    }""" % encode_cursor([state["middle_customer_id"]])
+
+
+def total_revenue(state, i):
+    return "{ totalRevenue totalOrders totalCustomers }"
+
+
+def create_order(state, i):
+    return """
+    mutation {
+      createOrder(customerId: "%d", productIds: [%s]) { order { id totalAmount } }
+    }""" % (state["customer_id"], ", ".join(f'"{pid}"' for pid in state["product_ids"][:3]))
+
+
+def bulk_create_customers(state, i):
+    rows = ", ".join(
+        f'{{name: "Bench {i}-{n}", email: "bench{i}-{n}@example.com", phone: "+1555000{n:04d}"}}'
+        for n in range(100)
+    )
+    return """
+    mutation {
+      bulkCreateCustomers(input: [%s]) { customers { id } errors }
+    }""" % rows
+
+
+def update_low_stock_products(state, i):
+    return "mutation { updateLowStockProducts { message updatedProducts } }"
+
+
+# (name, document builder, is a mutation)
+BENCHMARKS = (
+    ("allOrders filtered", all_orders_filtered, False),
+    ("allCustomers first page", all_customers_first_page, False),
+    ("allCustomers offset deep", all_customers_offset_deep, False),
+    ("allCustomers keyset deep", all_customers_keyset_deep, False),
+    ("totalRevenue", total_revenue, False),
+    ("createOrder", create_order, True),
+    ("bulkCreateCustomers x100", bulk_create_customers, True),
+    ("updateLowStockProducts", update_low_stock_products, True),
+)
+
+
+@contextmanager
+def rolled_back():
+    """Run a mutation for real, then undo it so every repeat sees the same data."""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=settings.BASE_DIR, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the main CRM queries and mutations at 1k/100k/1M orders, recording "
+        "wall time and SQL query counts as JSON that can be compared across commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scales", default="1k,100k,1m",
+            help=f"Comma-separated fixture sizes from {', '.join(SCALES)}.",
+        )
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark.")
+        parser.add_argument(
+            "--db-dir", default="/tmp",
+            help="Where the per-scale SQLite fixture databases are kept between runs.",
+        )
+        parser.add_argument("--reseed", action="store_true", help="Rebuild the fixture databases.")
+        parser.add_argument("--output", default="crm_benchmark.json", help="JSON results file.")
+        parser.add_argument("--compare", help="Earlier results file to compare against.")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.2,
+            help="Allowed relative slowdown of the median before a regression is reported.",
+        )
+        parser.add_argument(
+            "--fail-on-regression", action="store_true",
+            help="Exit with an error if --compare finds a regression.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("The benchmark seeds throwaway SQLite databases; configure SQLite.")
+        scales = [s.strip().lower() for s in options["scales"].split(",") if s.strip()]
+        unknown = [s for s in scales if s not in SCALES]
+        if unknown:
+            raise CommandError(f"Unknown scale(s): {', '.join(unknown)}")
+
+        results = {}
+        for scale in scales:
+            path = os.path.join(options["db_dir"], f"crm_benchmark_{scale}.sqlite3")
+            with self.fixture_database(path, SCALES[scale], options["reseed"]):
+                results[scale] = self.run_scale(scale, options["repeat"])
+
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "created": timezone.now().isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "sqlite": connection.Database.sqlite_version,
+                "repeat": options["repeat"],
+            },
+            "results": results,
+        }
+        with open(options["output"], "w") as fh:
+            json.dump(report, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+        if options["compare"]:
+            regressions = self.compare(options["compare"], results, options["tolerance"])
+            if regressions and options["fail_on_regression"]:
+                raise CommandError(f"{regressions} benchmark regression(s)")
+
+    @contextmanager
+    def fixture_database(self, path, orders, reseed):
+        original = connection.settings_dict["NAME"]
+        connection.close()
+        if reseed and os.path.exists(path):
+            os.remove(path)
+        connection.settings_dict["NAME"] = path
+        try:
+            call_command("migrate", verbosity=0)
+            if Order.objects.count() != orders:
+                connection.close()
+                os.remove(path)
+                call_command("migrate", verbosity=0)
+                self.stdout.write(f"Seeding {orders} orders into {path} ...")
+                start = time.perf_counter()
+                seed_orders(orders)
+                self.stdout.write(f"  seeded in {time.perf_counter() - start:.1f} s")
+            yield
+        finally:
+            connection.close()
+            connection.settings_dict["NAME"] = original
+
+    def run_scale(self, scale, repeat):
+        ids = list(Customer.objects.order_by("pk").values_list("pk", flat=True)[:1])
+        state = {
+            "customers": Customer.objects.count(),
+            "customer_id": ids[0],
+            "middle_customer_id": Customer.objects.order_by("pk")
+            .values_list("pk", flat=True)[Customer.objects.count() // 2],
+            "product_ids": list(Product.objects.order_by("pk").values_list("pk", flat=True)[:3]),
+        }
+        client = Client(SERVER_NAME="localhost")
+        results = {}
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{scale} orders"))
+        self.stdout.write(f"  {'benchmark':<28}{'median ms':>11}{'min ms':>10}{'max ms':>10}{'queries':>9}")
+        # Measure the uncached path whatever the deployment settings say.
+        with override_settings(CRM_GRAPHQL_RESPONSE_CACHE={"ENABLED": False}):
+            for name, build, mutation in BENCHMARKS:
+                timings, queries = [], 0
+                for i in range(repeat + 1):
+                    document = build(state, i)
+                    with rolled_back() if mutation else nullcontext():
+                        with CaptureQueriesContext(connection) as ctx:
+                            start = time.perf_counter()
+                            response = client.post(
+                                "/graphql", json.dumps({"query": document}),
+                                content_type="application/json",
+                            )
+                            elapsed = time.perf_counter() - start
+                    body = response.json()
+                    if body.get("errors"):
+                        raise CommandError(f"{name}: {body['errors'][0]['message']}")
+                    if i:  # the first run only warms caches
+                        timings.append(elapsed * 1000)
+                        queries = len(ctx)
+                results[name] = {
+                    "median_ms": round(statistics.median(timings), 3),
+                    "min_ms": round(min(timings), 3),
+                    "max_ms": round(max(timings), 3),
+                    "queries": queries,
+                }
+                r = results[name]
+                self.stdout.write(
+                    f"  {name:<28}{r['median_ms']:>11.2f}{r['min_ms']:>10.2f}{r['max_ms']:>10.2f}{queries:>9}"
+                )
+        return results
+
+    def compare(self, path, results, tolerance):
+        with open(path) as fh:
+            baseline = json.load(fh)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Compared with {path} (commit {baseline['meta'].get('commit')})"
+        ))
+        regressions = 0
+        for scale, benchmarks in results.items():
+            for name, current in benchmarks.items():
+                before = baseline["results"].get(scale, {}).get(name)
+                if before is None:
+                    continue
+                ratio = current["median_ms"] / before["median_ms"] if before["median_ms"] else 1
+                slower = ratio > 1 + tolerance
+                more_sql = current["queries"] > before["queries"]
+                line = (
+                    f"  {scale:>5} {name:<28} {before['median_ms']:>9.2f} -> {current['median_ms']:>9.2f} ms "
+                    f"({ratio:.2f}x), queries {before['queries']} -> {current['queries']}"
+                )
+                if slower or more_sql:
+                    regressions += 1
+                    self.stdout.write(self.style.ERROR(line + "  REGRESSION"))
+                else:
+                    self.stdout.write(line)
+        return regressions
@@ -0,0 +1,168 @@
+import asyncio
+import io
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+
+DEFAULT_QUERY = """
+{
+  totalCustomers
+  totalOrders
+  totalRevenue
+  allOrders(first: 20) {
+    edges { node { id totalAmount customer { name email } products { edges { node { name price } } } } }
+  }
+  allProducts(first: 20) { edges { node { name stock } } }
+}
+"""
+
+# (label, server interface, path)
+TARGETS = (
+    ("wsgi  sync view ", "wsgi", "/graphql"),
+    ("asgi  sync view ", "asgi", "/graphql"),
+    ("asgi  async view", "asgi", "/graphql/async"),
+)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def wsgi_request(app, path, body):
+    environ = {
+        "REQUEST_METHOD": "POST",
+        "PATH_INFO": path,
+        "SCRIPT_NAME": "",
+        "QUERY_STRING": "",
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    status = []
+
+    def start_response(value, headers, exc_info=None):
+        status.append(int(value.split()[0]))
+
+    response = app(environ, start_response)
+    try:
+        b"".join(response)
+    finally:
+        if hasattr(response, "close"):
+            response.close()
+    return status[0]
+
+
+async def asgi_request(app, path, body):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"host", b"localhost"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("localhost", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # Never disconnect; Django cancels this once the response is sent.
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests/sec and latency of the GraphQL endpoint through the "
+        "WSGI and ASGI applications, in process and against the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Timed requests per target.")
+        parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once.")
+        parser.add_argument("--warmup", type=int, default=20, help="Untimed requests per target.")
+        parser.add_argument("--query", default=DEFAULT_QUERY, help="GraphQL document to send.")
+
+    def handle(self, *args, **options):
+        body = json.dumps({"query": options["query"]}).encode()
+        wsgi_app = get_wsgi_application()
+        asgi_app = get_asgi_application()
+
+        self.stdout.write(
+            f"{options['requests']} requests, concurrency {options['concurrency']}"
+        )
+        self.stdout.write(f"{'target':<18}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for label, interface, path in TARGETS:
+            if interface == "wsgi":
+                run = self.run_wsgi(wsgi_app, path, body, options)
+            else:
+                run = asyncio.run(self.run_asgi(asgi_app, path, body, options))
+            elapsed, latencies, errors = run
+            latencies.sort()
+            self.stdout.write(
+                f"{label:<18}{len(latencies) / elapsed:>10.1f}"
+                f"{percentile(latencies, 50) * 1000:>10.2f}"
+                f"{percentile(latencies, 99) * 1000:>10.2f}{errors:>8}"
+            )
+
+    def run_wsgi(self, app, path, body, options):
+        def timed(_):
+            start = time.perf_counter()
+            status = wsgi_request(app, path, body)
+            return time.perf_counter() - start, status
+
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            list(pool.map(timed, range(options["warmup"])))
+            start = time.perf_counter()
+            results = list(pool.map(timed, range(options["requests"])))
+            elapsed = time.perf_counter() - start
+        return elapsed, [r[0] for r in results], sum(1 for r in results if r[1] != 200)
+
+    async def run_asgi(self, app, path, body, options):
+        semaphore = asyncio.Semaphore(options["concurrency"])
+
+        async def timed():
+            async with semaphore:
+                start = time.perf_counter()
+                status = await asgi_request(app, path, body)
+                return time.perf_counter() - start, status
+
+        await asyncio.gather(*(timed() for _ in range(options["warmup"])))
+        start = time.perf_counter()
+        results = await asyncio.gather(*(timed() for _ in range(options["requests"])))
+        elapsed = time.perf_counter() - start
+        return elapsed, [r[0] for r in results], sum(1 for r in results if r[1] != 200)
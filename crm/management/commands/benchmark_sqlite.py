@@ -0,0 +1,176 @@
+import os
+import random
+import shutil
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from crm.models import Customer, Order, Product
+from crm.orders import create_order
+from crm.seeding import seed_orders
+
+# Database settings and CRM_SQLITE per profile, as alx_backend_graphql/settings.py
+# sets them for CRM_DB_PROFILE.
+PROFILES = {
+    "development": (
+        {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False, "OPTIONS": {}},
+        {"ENABLED": False},
+    ),
+    "production": (
+        {
+            "CONN_MAX_AGE": 600,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {"transaction_mode": "IMMEDIATE", "timeout": 5},
+        },
+        {"ENABLED": True},
+    ),
+}
+
+
+def read_page(state, rng):
+    """The filtered allOrders page: newest orders since a date, with customers."""
+    since = state["today"] - timedelta(days=rng.randrange(1, 365))
+    list(
+        Order.objects.filter(order_date__gte=since)
+        .select_related("customer").order_by("-order_date")[:50]
+    )
+
+
+def write_order(state, rng):
+    create_order(rng.choice(state["customer_ids"]), rng.sample(state["product_ids"], 2))
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent readers and writers against copies of one SQLite database, "
+        "once per database profile, and compare their throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=100_000, help="Orders in the fixture.")
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument("--seconds", type=float, default=10, help="Duration per profile.")
+        parser.add_argument("--db-dir", default="/tmp")
+        parser.add_argument(
+            "--profiles", default="development,production",
+            help=f"Comma-separated, from {', '.join(PROFILES)}.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("This benchmark compares SQLite profiles; configure SQLite.")
+        profiles = [p.strip() for p in options["profiles"].split(",") if p.strip()]
+        unknown = [p for p in profiles if p not in PROFILES]
+        if unknown:
+            raise CommandError(f"Unknown profile(s): {', '.join(unknown)}")
+
+        base = os.path.join(options["db_dir"], f"crm_sqlite_bench_{options['orders']}.sqlite3")
+        with self.database(base, PROFILES["development"]):
+            call_command("migrate", verbosity=0)
+            if Order.objects.count() != options["orders"]:
+                connection.close()
+                os.remove(base)
+                call_command("migrate", verbosity=0)
+                self.stdout.write(f"Seeding {options['orders']} orders into {base} ...")
+                seed_orders(options["orders"])
+
+        results = {}
+        for profile in profiles:
+            path = base.replace(".sqlite3", f"_{profile}.sqlite3")
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            shutil.copyfile(base, path)
+            with self.database(path, PROFILES[profile]):
+                results[profile] = self.run_profile(profile, options)
+
+        if "development" in results and "production" in results:
+            before, after = results["development"], results["production"]
+            for kind in ("read", "write"):
+                if before[kind]:
+                    self.stdout.write(
+                        f"{kind}s: {after[kind] / before[kind]:.2f}x the development profile"
+                    )
+
+    @contextmanager
+    def database(self, path, profile):
+        database_settings, sqlite_settings = profile
+        settings_dict = connection.settings_dict
+        original = {key: settings_dict.get(key) for key in ("NAME", *database_settings)}
+        connection.close()
+        # Worker threads build their connections from this same dict.
+        settings_dict.update(database_settings, NAME=path)
+        try:
+            with override_settings(CRM_SQLITE=sqlite_settings):
+                yield
+        finally:
+            connection.close()
+            settings_dict.update(original)
+
+    def run_profile(self, profile, options):
+        state = {
+            "today": timezone.now(),
+            "customer_ids": list(Customer.objects.values_list("pk", flat=True)[:10000]),
+            "product_ids": list(Product.objects.values_list("pk", flat=True)),
+        }
+        connection.close()
+        deadline = time.perf_counter() + options["seconds"]
+        latencies = {"read": [], "write": []}
+        errors = {"read": 0, "write": 0}
+        lock = threading.Lock()
+
+        def worker(kind, operation, seed):
+            rng = random.Random(seed)
+            timings, failed = [], 0
+            try:
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    try:
+                        operation(state, rng)
+                        timings.append(time.perf_counter() - start)
+                    except OperationalError:  # database is locked
+                        failed += 1
+                    finally:
+                        # What request_finished does after every request.
+                        close_old_connections()
+            finally:
+                connection.close()
+            with lock:
+                latencies[kind].extend(timings)
+                errors[kind] += failed
+
+        threads = [
+            threading.Thread(target=worker, args=("read", read_page, i))
+            for i in range(options["readers"])
+        ] + [
+            threading.Thread(target=worker, args=("write", write_order, 1000 + i))
+            for i in range(options["writers"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{profile}: {options['readers']} readers, {options['writers']} writers, "
+            f"{options['seconds']:g} s"
+        ))
+        throughput = {}
+        for kind, timings in latencies.items():
+            throughput[kind] = len(timings) / options["seconds"]
+            p50 = statistics.median(timings) * 1000 if timings else 0
+            p95 = statistics.quantiles(timings, n=20)[-1] * 1000 if len(timings) > 1 else p50
+            self.stdout.write(
+                f"  {kind}s: {throughput[kind]:8.1f}/s  p50 {p50:7.2f} ms  "
+                f"p95 {p95:7.2f} ms  {errors[kind]} locked"
+            )
+        return throughput
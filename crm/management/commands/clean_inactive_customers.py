@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from crm.cleanup import (
+    DEFAULT_CLEANUP_CHUNK_SIZE, DEFAULT_INACTIVE_DAYS, delete_inactive_customers,
+    inactive_customers,
+)
+from crm.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete customers with no order in the last --days days, together with "
+        "their orders, in chunks that each commit on their own."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=DEFAULT_INACTIVE_DAYS)
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CLEANUP_CHUNK_SIZE)
+        parser.add_argument(
+            "--pause", type=float, default=0,
+            help="Seconds to sleep between chunks so other writers get the lock.",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Only count the customers and orders that would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        inactive = inactive_customers(cutoff)
+
+        if options["dry_run"]:
+            customers = inactive.count()
+            orders = Order.objects.filter(customer__in=inactive.values("pk")).count()
+            self.stdout.write(
+                f"Would delete {customers} inactive customers ({orders} orders) "
+                f"with no order since {cutoff:%Y-%m-%d}"
+            )
+            return
+
+        total = inactive.count()
+        customers = orders = 0
+        for chunk_customers, chunk_orders in delete_inactive_customers(
+            cutoff, options["chunk_size"], options["pause"]
+        ):
+            customers += chunk_customers
+            orders += chunk_orders
+            if options["verbosity"] >= 1:
+                self.stdout.write(f"  {customers}/{total} customers, {orders} orders deleted")
+        self.stdout.write(f"Deleted {customers} inactive customers ({orders} orders)")
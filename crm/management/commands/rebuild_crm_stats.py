@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from crm import stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the CRM statistics row from the Customer and Order tables."
+
+    def handle(self, *args, **options):
+        result = stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"CRM stats rebuilt: {result}"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from crm import search
+
+
+class Command(BaseCommand):
+    help = (
+        "Create any missing FTS5 search tables and triggers and refill every "
+        "search table from the customer and product tables."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if not search.fts_available(connection):
+            raise CommandError("This database has no SQLite FTS5; search falls back to icontains.")
+        with transaction.atomic(using=options["database"]):
+            tables = search.install(connection, rebuild=True)
+            with connection.cursor() as cursor:
+                for table in tables:
+                    # Merge the rebuilt index into as few b-trees as possible.
+                    cursor.execute(f"INSERT INTO {table}({table}) VALUES ('optimize')")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {', '.join(tables)}"))
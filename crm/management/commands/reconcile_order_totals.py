@@ -0,0 +1,36 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+from crm import stats
+from crm.models import LINE_TOTAL, OrderLine
+from crm.orders import order_total_drift, reconcile_order_totals
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare every Order.total_amount with the sum of its lines in SQL and "
+        "correct the ones that drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Only report the orders whose totals differ from their lines.",
+        )
+
+    def handle(self, *args, **options):
+        revenue = OrderLine.objects.aggregate(
+            total=Coalesce(Sum(LINE_TOTAL), Decimal("0"))
+        )["total"]
+        self.stdout.write(
+            f"Revenue from order lines: {Decimal(revenue).quantize(Decimal('0.01'))}, "
+            f"stats row: {stats.get_stats().total_revenue}"
+        )
+        if options["dry_run"]:
+            self.stdout.write(f"{order_total_drift().count()} orders differ from their lines")
+            return
+        fixed = reconcile_order_totals()
+        self.stdout.write(self.style.SUCCESS(f"Corrected {fixed} order totals"))
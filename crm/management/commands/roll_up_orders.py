@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm import analytics
+
+
+class Command(BaseCommand):
+    help = (
+        "Extend the daily order roll-up behind revenueByPeriod and ordersByPeriod "
+        "from its high-water mark up to yesterday."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full", action="store_true",
+            help="Drop the roll-up and rebuild it from the first order.",
+        )
+        parser.add_argument("--chunk-days", type=int, default=analytics.DEFAULT_CHUNK_DAYS)
+
+    def handle(self, *args, **options):
+        if options["chunk_days"] < 1:
+            raise CommandError("--chunk-days must be positive.")
+        if options["full"]:
+            analytics.reset()
+        start = time.perf_counter()
+        days = analytics.roll_up(chunk_days=options["chunk_days"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled up {days} days in {time.perf_counter() - start:.1f} s; "
+            f"covered up to {analytics.rolled_up_until()}"
+        ))
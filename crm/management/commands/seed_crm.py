@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from crm.seeding import DEFAULT_BATCH_SIZE, DEFAULT_SEED, fixture_sizes, seed_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a deterministic load-testing data set: customers, products, orders "
+        "and order lines from a fixed seed, inserted in bulk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=1_000_000)
+        parser.add_argument(
+            "--customers", type=int,
+            help="Defaults to one customer per ten orders.",
+        )
+        parser.add_argument(
+            "--products", type=int,
+            help="Defaults to one product per 200 orders, between 20 and 5000.",
+        )
+        parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            "--no-pragmas", action="store_false", dest="pragmas",
+            help="Keep SQLite's normal durability settings during the load.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        if min(options[n] or 0 for n in ("orders", "customers", "products")) < 0:
+            raise CommandError("Row counts cannot be negative.")
+        customers, products = fixture_sizes(options["orders"])
+        if options["customers"] is not None:
+            customers = options["customers"]
+        if options["products"] is not None:
+            products = options["products"]
+
+        def progress(model, done, total):
+            if options["verbosity"] >= 2 or (options["verbosity"] >= 1 and done == total):
+                self.stdout.write(f"  {model}: {done}/{total}")
+
+        self.stdout.write(
+            f"Seeding {customers} customers, {products} products and "
+            f"{options['orders']} orders (seed {options['seed']})"
+        )
+        start = time.perf_counter()
+        try:
+            created = seed_orders(
+                options["orders"], customers, products, seed=options["seed"],
+                batch_size=options["batch_size"], pragmas=options["pragmas"], progress=progress,
+            )
+        except IntegrityError as exc:
+            raise CommandError(
+                f"{exc}. This seed has probably been loaded already; use another --seed."
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created} in {time.perf_counter() - start:.1f} s"
+        ))
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from crm import response_cache
+from crm.models import Customer, Order, Product
+from crm.routing import get_config
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database onto the read replica alias with SQLite's "
+        "online backup, once or every --interval seconds. A local stand-in for replication."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval", type=float, default=0,
+            help="Keep syncing every this many seconds instead of once.",
+        )
+
+    def handle(self, *args, **options):
+        config = get_config()
+        primary, replica = connections[config["WRITE_ALIAS"]], connections[config["READ_ALIAS"]]
+        if primary.vendor != "sqlite" or replica.vendor != "sqlite":
+            raise CommandError("sync_replica copies SQLite files; use real replication elsewhere.")
+
+        while True:
+            start = time.perf_counter()
+            self.sync(primary, replica)
+            if options["verbosity"] >= 1:
+                self.stdout.write(
+                    f"Synced {config['WRITE_ALIAS']} -> {config['READ_ALIAS']} "
+                    f"in {(time.perf_counter() - start) * 1000:.0f} ms"
+                )
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
+
+    def sync(self, primary, replica):
+        primary.ensure_connection()
+        replica.ensure_connection()
+        primary.connection.backup(replica.connection)
+        # A query that read the replica before this sync may have cached a
+        # response older than the primary; drop those.
+        for model in (Customer, Product, Order):
+            response_cache.bump_model_version(model)
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:03
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def build_stats(apps, schema_editor):
+    Customer = apps.get_model('crm', 'Customer')
+    Order = apps.get_model('crm', 'Order')
+    CRMStats = apps.get_model('crm', 'CRMStats')
+    CRMStats.objects.create(
+        pk=1,
+        total_customers=Customer.objects.count(),
+        total_orders=Order.objects.count(),
+        total_revenue=Order.objects.aggregate(total=Sum('total_amount'))['total'] or 0,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CRMStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_customers', models.PositiveIntegerField(default=0)),
+                ('total_orders', models.PositiveIntegerField(default=0)),
+                ('total_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(build_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0002_crmstats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['name', 'id'], name='crm_custome_name_2b098d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['phone'], name='crm_custome_phone_eb81ab_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['name', 'id'], name='crm_product_name_8df4f8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price', 'id'], name='crm_product_price_ec9d6e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['stock', 'id'], name='crm_product_stock_5f4bd6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['order_date', 'id'], name='crm_order_order_d_94dc9f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['total_amount', 'id'], name='crm_order_total_a_fdcf1c_idx'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_order_products(apps, schema_editor):
+    """
+    One INSERT ... SELECT from the auto-created order/product table. The
+    price at the time of sale was never stored, so existing lines take the
+    product's current price; quantity is 1, as the old table implied.
+    """
+    Order = apps.get_model("crm", "Order")
+    OrderLine = apps.get_model("crm", "OrderLine")
+    Product = apps.get_model("crm", "Product")
+    qn = schema_editor.quote_name
+    through = Order._meta.get_field("products").remote_field.through._meta
+    schema_editor.execute(
+        "INSERT INTO {lines} ({order_id}, {product_id}, {quantity}, {unit_price}) "
+        "SELECT t.{t_order}, t.{t_product}, 1, p.{price} "
+        "FROM {through} t INNER JOIN {product} p ON p.{pk} = t.{t_product}".format(
+            lines=qn(OrderLine._meta.db_table),
+            order_id=qn("order_id"), product_id=qn("product_id"),
+            quantity=qn("quantity"), unit_price=qn("unit_price"),
+            through=qn(through.db_table),
+            t_order=qn(through.get_field("order").column),
+            t_product=qn(through.get_field("product").column),
+            product=qn(Product._meta.db_table), price=qn("price"), pk=qn("id"),
+        )
+    )
+
+
+def copy_order_lines_back(apps, schema_editor):
+    Order = apps.get_model("crm", "Order")
+    OrderLine = apps.get_model("crm", "OrderLine")
+    qn = schema_editor.quote_name
+    through = Order._meta.get_field("products").remote_field.through._meta
+    schema_editor.execute(
+        "INSERT INTO {through} ({t_order}, {t_product}) SELECT {order_id}, {product_id} FROM {lines}".format(
+            through=qn(through.db_table),
+            t_order=qn(through.get_field("order").column),
+            t_product=qn(through.get_field("product").column),
+            order_id=qn("order_id"), product_id=qn("product_id"),
+            lines=qn(OrderLine._meta.db_table),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0003_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='crm.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_lines', to='crm.product')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='orderline',
+            constraint=models.UniqueConstraint(fields=('order', 'product'), name='crm_orderline_order_product_uniq'),
+        ),
+        migrations.RunPython(copy_order_products, copy_order_lines_back),
+        # A through model cannot be added to an existing ManyToManyField in
+        # place: drop the auto-created table, then re-add the field on top of
+        # OrderLine (which adds no table of its own).
+        migrations.RemoveField(
+            model_name='order',
+            name='products',
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='products',
+            field=models.ManyToManyField(through='crm.OrderLine', to='crm.product'),
+        ),
+    ]
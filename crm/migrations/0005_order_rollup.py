@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0004_orderline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderRollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('high_water_mark', models.DateTimeField(null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrderRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('orders', models.PositiveIntegerField()),
+                ('revenue', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('customer', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='crm.customer')),
+                ('product', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='crm.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='crm_rollup_day_idx'), models.Index(fields=['customer', 'day'], name='crm_rollup_customer_day_idx'), models.Index(fields=['product', 'day'], name='crm_rollup_product_day_idx')],
+            },
+        ),
+    ]
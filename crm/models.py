@@ -6,6 +6,13 @@ class Customer(models.Model):
     email = models.EmailField(unique=True)
     phone = models.CharField(max_length=20, blank=True, null=True)
 
+    class Meta:
+        # Kept in step with crm.filters by `manage.py advise_indexes`.
+        indexes = [
+            models.Index(fields=["name", "id"], name="crm_custome_name_2b098d_idx"),
+            models.Index(fields=["phone"], name="crm_custome_phone_eb81ab_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -15,21 +22,122 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["name", "id"], name="crm_product_name_8df4f8_idx"),
+            models.Index(fields=["price", "id"], name="crm_product_price_ec9d6e_idx"),
+            models.Index(fields=["stock", "id"], name="crm_product_stock_5f4bd6_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
 
 class Order(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name="orders")
-    products = models.ManyToManyField(Product)
+    products = models.ManyToManyField(Product, through="OrderLine")
     total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
     order_date = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["order_date", "id"], name="crm_order_order_d_94dc9f_idx"),
+            models.Index(fields=["total_amount", "id"], name="crm_order_total_a_fdcf1c_idx"),
+        ]
+
     def calculate_total(self):
-        total = sum(p.price for p in self.products.all())
+        """Recompute total_amount from the order's lines in one SQL aggregate."""
+        total = self.lines.aggregate(total=models.Sum(LINE_TOTAL))["total"] or 0
         self.total_amount = total
-        self.save()
+        self.save(update_fields=["total_amount"])
         return total
 
     def __str__(self):
         return f"Order {self.id} by {self.customer.name}"
+
+
+# quantity * unit_price of an OrderLine, for aggregates over lines.
+LINE_TOTAL = models.ExpressionWrapper(
+    models.F("quantity") * models.F("unit_price"),
+    output_field=models.DecimalField(max_digits=12, decimal_places=2),
+)
+
+
+class OrderLine(models.Model):
+    """
+    One product on an order, with the quantity and the unit price it sold at.
+
+    Order.total_amount is the sum of quantity * unit_price over its lines;
+    crm.signals keeps it in step when lines are saved or deleted one by one,
+    and crm.orders when they are written in bulk. Both update the total in
+    SQL, so refresh an Order in memory before saving it again.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="lines")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="order_lines")
+    quantity = models.PositiveIntegerField(default=1)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["order", "product"], name="crm_orderline_order_product_uniq"),
+        ]
+
+    @property
+    def line_total(self):
+        return self.quantity * self.unit_price
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} on order {self.order_id}"
+
+
+class CRMStats(models.Model):
+    """Single-row running totals, kept in step with Customer/Order by crm.signals."""
+    total_customers = models.PositiveIntegerField(default=0)
+    total_orders = models.PositiveIntegerField(default=0)
+    total_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.total_customers} customers, {self.total_orders} orders, {self.total_revenue} revenue"
+
+
+class OrderRollup(models.Model):
+    """
+    Orders and revenue per day: one row with neither customer nor product
+    for the day's totals, one per customer who ordered that day and one per
+    product sold that day. Built by crm.analytics; the customer and product
+    columns carry no constraint so that raw deletes in crm.cleanup work.
+    """
+    day = models.DateField()
+    customer = models.ForeignKey(
+        Customer, null=True, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+        related_name="+",
+    )
+    product = models.ForeignKey(
+        Product, null=True, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+        related_name="+",
+    )
+    orders = models.PositiveIntegerField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["day"], name="crm_rollup_day_idx"),
+            models.Index(fields=["customer", "day"], name="crm_rollup_customer_day_idx"),
+            models.Index(fields=["product", "day"], name="crm_rollup_product_day_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.day}: {self.orders} orders, {self.revenue} revenue"
+
+
+class OrderRollupState(models.Model):
+    """
+    Single row: OrderRollup holds every day before ``high_water_mark``.
+    Writes to orders dated before it move it back (crm.analytics.rewind).
+    """
+    high_water_mark = models.DateTimeField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Rolled up to {self.high_water_mark}"
@@ -0,0 +1,112 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from graphene.utils.str_converters import to_snake_case
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+PAGINATION_ARGS = {"first", "last", "before", "after", "offset", "order_by", "keyset"}
+
+
+# =====================================
+# Selection-set driven queryset planner
+# =====================================
+class QueryPlan:
+    """select_related / prefetch_related / only() derived from one selection."""
+
+    def __init__(self):
+        self.only = set()
+        self.select_related = []
+        self.prefetch_related = []
+        self.prunable = True
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if self.prunable and self.only:
+            queryset = queryset.only(*self.only)
+        return queryset
+
+
+def _selected_fields(selection_set, fragments):
+    """Yield the FieldNodes of a selection set, expanding fragments."""
+    if selection_set is None:
+        return
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            yield selection
+        elif isinstance(selection, InlineFragmentNode):
+            yield from _selected_fields(selection.selection_set, fragments)
+        elif isinstance(selection, FragmentSpreadNode):
+            fragment = fragments.get(selection.name.value)
+            if fragment is not None:
+                yield from _selected_fields(fragment.selection_set, fragments)
+
+
+def _connection_nodes(field_nodes, fragments):
+    """Return the selections under ``edges { node { ... } }``."""
+    nodes = []
+    for field in field_nodes:
+        for edges in _selected_fields(field.selection_set, fragments):
+            if edges.name.value != "edges":
+                continue
+            for node in _selected_fields(edges.selection_set, fragments):
+                if node.name.value == "node":
+                    nodes.append(node)
+    return nodes
+
+
+def _has_filter_args(field):
+    return any(
+        to_snake_case(arg.name.value) not in PAGINATION_ARGS
+        for arg in field.arguments or ()
+    )
+
+
+def _plan(model, field_nodes, fragments, plan, prefix=""):
+    """Walk ``field_nodes`` (selections on ``model``) and fill in ``plan``."""
+    plan.only.add(prefix + model._meta.pk.name)
+    for field in (f for node in field_nodes for f in _selected_fields(node.selection_set, fragments)):
+        name = field.name.value
+        if name.startswith("__"):
+            continue
+        name = to_snake_case(name)
+        if name == "id":
+            continue
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Computed field: its resolver may need any column.
+            plan.prunable = False
+            continue
+
+        if (model_field.many_to_one or model_field.one_to_one) and model_field.concrete:
+            plan.only.add(prefix + name)
+            plan.select_related.append(prefix + name)
+            _plan(model_field.related_model, [field], fragments, plan, prefix + name + "__")
+        elif model_field.one_to_many or model_field.many_to_many:
+            if _has_filter_args(field):
+                # Filtered relations are re-queried by their resolver.
+                continue
+            nested = QueryPlan()
+            related = model_field.related_model
+            _plan(related, _connection_nodes([field], fragments), fragments, nested)
+            if model_field.one_to_many:
+                nested.only.add(model_field.field.attname)
+            queryset = nested.apply(related._default_manager.all())
+            plan.prefetch_related.append(Prefetch(prefix + model_field.name, queryset=queryset))
+        elif model_field.concrete:
+            plan.only.add(prefix + name)
+
+
+def optimize_queryset(queryset, info):
+    """
+    Apply select_related, prefetch_related and only() to a connection
+    queryset according to what the client selected under ``edges.node``.
+    """
+    plan = QueryPlan()
+    nodes = _connection_nodes(info.field_nodes, info.fragments)
+    if not nodes:
+        return queryset.only(queryset.model._meta.pk.name)
+    _plan(queryset.model, nodes, info.fragments, plan)
+    return plan.apply(queryset)
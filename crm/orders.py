@@ -0,0 +1,151 @@
+from collections import Counter
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, QuerySet, Subquery, Sum
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+
+from crm import analytics, response_cache, stats
+from crm.models import LINE_TOTAL, Customer, Order, OrderLine, Product
+
+CENTS = Decimal("0.01")
+DEFAULT_REFRESH_CHUNK_SIZE = 500
+
+
+class OrderValidationError(Exception):
+    pass
+
+
+def create_order(customer_id, product_ids, order_date=None):
+    """
+    Create an order in a fixed number of statements.
+
+    One SELECT validates the customer and reads the products' prices, one
+    INSERT writes the order with total_amount already set, and one bulk
+    INSERT writes its lines with those prices as the unit price. A product
+    listed more than once becomes one line with that quantity.
+    """
+    try:
+        customer_id = int(customer_id)
+    except (TypeError, ValueError):
+        raise OrderValidationError("Invalid customer ID.")
+    if not product_ids:
+        raise OrderValidationError("At least one product must be provided.")
+    try:
+        quantities = Counter(int(product_id) for product_id in product_ids)
+    except (TypeError, ValueError):
+        raise OrderValidationError("One or more invalid product IDs.")
+
+    rows = list(
+        Product.objects.filter(id__in=quantities)
+        .annotate(customer_exists=Exists(Customer.objects.filter(pk=customer_id)))
+        .values_list("id", "customer_exists", "price")
+    )
+    if not rows or not rows[0][1]:
+        # Only reached on the error path; tell the two failures apart.
+        if not Customer.objects.filter(pk=customer_id).exists():
+            raise OrderValidationError("Invalid customer ID.")
+    if len(rows) != len(quantities):
+        raise OrderValidationError("One or more invalid product IDs.")
+
+    lines = [
+        OrderLine(product_id=product_id, quantity=quantities[product_id], unit_price=price)
+        for product_id, _, price in rows
+    ]
+    with transaction.atomic():
+        order = Order.objects.create(
+            customer_id=customer_id,
+            order_date=order_date or timezone.now(),
+            total_amount=sum((line.line_total for line in lines), Decimal("0")).quantize(CENTS),
+        )
+        for line in lines:
+            line.order = order
+        OrderLine.objects.bulk_create(lines)
+    return order
+
+
+# =====================================
+# Order totals
+# =====================================
+def adjust_order_total(order_id, delta):
+    """Move one order's total, and total revenue, by ``delta`` in SQL."""
+    # Its lines changed even when the total did not: per-product rollup rows.
+    analytics.rewind_orders([order_id])
+    delta = stats.to_decimal(delta)
+    if not delta:
+        return
+    # Rounded in SQL: SQLite does this arithmetic in floating point.
+    Order.objects.filter(pk=order_id).update(total_amount=Round(F("total_amount") + delta, 2))
+    stats.adjust(revenue=delta)
+    response_cache.bump_model_version(Order)
+
+
+@transaction.atomic
+def add_order_lines(order_id, quantities):
+    """
+    Add ``{product_id: quantity}`` to an order at the products' current
+    prices: one SELECT, one bulk INSERT and one UPDATE of the total.
+    """
+    prices = dict(Product.objects.filter(pk__in=quantities).values_list("pk", "price"))
+    if len(prices) != len(quantities):
+        raise OrderValidationError("One or more invalid product IDs.")
+    lines = OrderLine.objects.bulk_create(
+        OrderLine(order_id=order_id, product_id=pk, quantity=quantity, unit_price=prices[pk])
+        for pk, quantity in quantities.items()
+    )
+    adjust_order_total(order_id, sum((line.line_total for line in lines), Decimal("0")))
+    return lines
+
+
+def lines_total():
+    """Subquery: the sum of quantity * unit_price over the outer order's lines."""
+    return Subquery(
+        OrderLine.objects.filter(order=OuterRef("pk")).values("order")
+        .annotate(total=Round(Sum(LINE_TOTAL), 2)).values("total")
+    )
+
+
+def order_total_drift():
+    """Orders whose total_amount is not the sum of their lines, as one query."""
+    return Order.objects.alias(
+        expected=Coalesce(lines_total(), Decimal("0"))
+    ).exclude(total_amount=F("expected"))
+
+
+@transaction.atomic
+def refresh_order_totals(orders, chunk_size=DEFAULT_REFRESH_CHUNK_SIZE):
+    """
+    Recompute the totals of ``orders`` (a queryset or ids) from their lines
+    with one UPDATE per chunk, and move total revenue by the difference.
+    Returns the number of orders updated.
+    """
+    if isinstance(orders, QuerySet):
+        # The UPDATE changes which rows a drift filter matches; pin the ids.
+        orders = orders.values_list("pk", flat=True)
+    order_ids = list(orders)
+    if order_ids:
+        analytics.rewind_orders(order_ids)
+    revenue = Coalesce(Sum("total_amount"), Decimal("0"))
+    updated, delta = 0, Decimal("0")
+    for start in range(0, len(order_ids), chunk_size):
+        chunk = Order.objects.filter(pk__in=order_ids[start:start + chunk_size])
+        before = chunk.aggregate(total=revenue)["total"]
+        updated += chunk.update(total_amount=Coalesce(lines_total(), Decimal("0")))
+        delta += chunk.aggregate(total=revenue)["total"] - before
+    if updated:
+        stats.adjust(revenue=delta)
+        response_cache.bump_model_version(Order)
+    return updated
+
+
+@transaction.atomic
+def reconcile_order_totals():
+    """
+    Correct every order whose total drifted from its lines, then rebuild
+    the stats row, which drifted with them. Returns the orders corrected.
+    """
+    fixed = refresh_order_totals(order_total_drift())
+    if fixed:
+        stats.rebuild()
+    return fixed
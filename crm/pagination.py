@@ -0,0 +1,161 @@
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from graphene.relay.connection import connection_adapter, page_info_adapter
+from graphql_relay.utils import base64, unbase64
+
+KEYSET_PREFIX = "keyset:"
+
+
+# =====================================
+# Keyset (seek) pagination
+# =====================================
+class CursorEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder without its cut to milliseconds: a cursor that lost
+    the boundary row's microseconds would seek back onto that row.
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    return base64(KEYSET_PREFIX + json.dumps(values, cls=CursorEncoder))
+
+
+def decode_cursor(cursor, size):
+    try:
+        raw = unbase64(cursor)
+        if not raw.startswith(KEYSET_PREFIX):
+            raise ValueError
+        values = json.loads(raw[len(KEYSET_PREFIX):])
+    except ValueError:
+        raise Exception("Invalid cursor for keyset pagination.")
+    if not isinstance(values, list) or len(values) != size:
+        raise Exception("Cursor does not match the requested ordering.")
+    return values
+
+
+def cursor_values(model, keys, values):
+    """Turn decoded cursor values back into values of the sort-key fields."""
+    meta = model._meta
+    try:
+        return [
+            None if value is None
+            else (meta.pk if name == "pk" else meta.get_field(name)).to_python(value)
+            for (name, _), value in zip(keys, values)
+        ]
+    except (FieldDoesNotExist, ValidationError):
+        raise Exception("Invalid cursor for keyset pagination.")
+
+
+def sort_keys(queryset):
+    """
+    Return ``[(field, descending), ...]`` for the queryset's ordering,
+    with the primary key appended as a tiebreaker (see stable_ordering).
+    """
+    keys = []
+    for term in queryset.query.order_by:
+        if not isinstance(term, str) or term == "?":
+            raise Exception("Keyset pagination needs a plain field ordering.")
+        descending = term.startswith("-")
+        name = term.lstrip("-")
+        keys.append(("pk" if name in ("pk", "id") else name, descending))
+    if not any(name == "pk" for name, _ in keys):
+        keys.append(("pk", keys[-1][1] if keys else False))
+    return keys
+
+
+def stable_ordering(queryset):
+    """
+    Order by pk, or append pk as a tiebreaker, so pages never overlap. The
+    tiebreaker follows the direction of the last term so that a single
+    (field, id) index serves both directions.
+    """
+    if not queryset.ordered:
+        return queryset.order_by("pk")
+    terms = queryset.query.order_by
+    if terms and all(isinstance(t, str) for t in terms) \
+            and not any(t.lstrip("-") in ("pk", "id", "?") for t in terms):
+        return queryset.order_by(*terms, "-pk" if terms[-1].startswith("-") else "pk")
+    return queryset
+
+
+def seek_filter(keys, values, forward):
+    """
+    Build the row-value predicate ``(k1, k2, ..) > (v1, v2, ..)`` as an OR
+    of AND terms, honouring each key's direction.
+    """
+    condition = Q()
+    equal = Q()
+    for (name, descending), value in zip(keys, values):
+        lookup = "lt" if descending == forward else "gt"
+        condition |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def keyset_connection(connection, queryset, args, max_limit=None):
+    """
+    Slice ``queryset`` with keyset predicates instead of OFFSET.
+
+    Cursors carry the sort-key values of their row, so every page costs one
+    indexed range scan no matter how deep it is. No COUNT(*) is issued; the
+    connection's totalCount resolves it lazily if the client selects it.
+
+    Only the paging direction is probed for more rows. Paging forward,
+    hasPreviousPage is true whenever ``after`` is given (the row it points
+    at came before), and paging backward hasNextPage is true whenever
+    ``before`` is; the Relay spec allows this in place of an extra query.
+    """
+    if args.get("offset"):
+        raise Exception("offset cannot be combined with keyset pagination.")
+    first, last = args.get("first"), args.get("last")
+    after, before = args.get("after"), args.get("before")
+
+    keys = sort_keys(queryset)
+    annotations = {f"_keyset_{i}": F(name) for i, (name, _) in enumerate(keys)}
+    page = queryset.annotate(**annotations).order_by(
+        *(("-" if descending else "") + name for name, descending in keys)
+    )
+    for cursor, forward in ((after, True), (before, False)):
+        if cursor:
+            values = cursor_values(queryset.model, keys, decode_cursor(cursor, len(keys)))
+            page = page.filter(seek_filter(keys, values, forward=forward))
+
+    backward = last is not None and first is None
+    limit = (last if backward else first) or max_limit
+    if backward:
+        page = page.reverse()
+    rows = list(page[:limit + 1] if limit is not None else page)
+    has_more = limit is not None and len(rows) > limit
+    rows = rows[:limit] if limit is not None else rows
+    if backward:
+        rows.reverse()
+
+    edges = [
+        connection.Edge(
+            node=row,
+            cursor=encode_cursor([getattr(row, name) for name in annotations]),
+        )
+        for row in rows
+    ]
+    result = connection_adapter(
+        connection,
+        edges,
+        page_info_adapter(
+            edges[0].cursor if edges else None,
+            edges[-1].cursor if edges else None,
+            has_more if backward else bool(after),
+            bool(before) if backward else has_more,
+        ),
+    )
+    result.iterable = queryset
+    result.length = None
+    return result
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from graphql import (
+    GraphQLObjectType, OperationType, TypeInfo, TypeInfoVisitor, Visitor, get_named_type,
+    print_ast, visit,
+)
+
+from crm.models import Customer, Order, Product
+
+CACHED_MODELS = (Customer, Product, Order)
+
+# Root fields that do not return a Django type, and what they read.
+ROOT_FIELD_MODELS = {
+    "totalCustomers": (Customer,),
+    "totalOrders": (Order,),
+    "totalRevenue": (Order,),
+    # Computed from orders and their lines; roll_up() bumps Order too.
+    "revenueByPeriod": (Order,),
+    "ordersByPeriod": (Order,),
+}
+
+DEFAULTS = {
+    "ENABLED": False,
+    # Any Django cache alias. A local-memory cache is only coherent with a
+    # single worker process; use a shared backend (Redis, Memcached,
+    # database) when running several.
+    "CACHE": "default",
+    "TIMEOUT": 30,
+}
+
+VERSION_PREFIX = "crm:gqlver:"
+RESPONSE_PREFIX = "crm:gqlresp:"
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "CRM_GRAPHQL_RESPONSE_CACHE", {})}
+
+
+def get_cache():
+    return caches[get_config()["CACHE"]]
+
+
+# =====================================
+# Per-model version tags
+# =====================================
+def _version_key(model):
+    return VERSION_PREFIX + model._meta.label_lower
+
+
+def model_versions(models):
+    """Current version tag of each model, seeding missing tags."""
+    cache = get_cache()
+    keys = [_version_key(m) for m in models]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # Seed with the clock, not 0, so an evicted tag can never
+            # resurrect entries cached under an older value.
+            cache.add(key, time.time_ns())
+            found[key] = cache.get(key)
+    return tuple(found[k] for k in keys)
+
+
+def bump_model_version(model):
+    """Invalidate every cached response that read ``model``, once the write commits."""
+    def bump():
+        cache = get_cache()
+        try:
+            cache.incr(_version_key(model))
+        except ValueError:
+            cache.set(_version_key(model), time.time_ns(), None)
+    transaction.on_commit(bump)
+
+
+# =====================================
+# Response cache
+# =====================================
+class _ModelCollector(Visitor):
+    def __init__(self, type_info):
+        super().__init__()
+        self.type_info = type_info
+        self.models = set()
+
+    def enter_field(self, node, *args):
+        parent = self.type_info.get_parent_type()
+        field_type = self.type_info.get_type()
+        if parent is None or field_type is None:
+            return
+        named = get_named_type(field_type)
+        graphene_type = getattr(named, "graphene_type", None)
+        model = getattr(getattr(graphene_type, "_meta", None), "model", None)
+        if model is not None:
+            self.models.add(model)
+        elif getattr(parent, "name", None) == "Query":
+            if node.name.value in ROOT_FIELD_MODELS:
+                self.models.update(ROOT_FIELD_MODELS[node.name.value])
+            elif not isinstance(named, GraphQLObjectType):
+                self.models.update(CACHED_MODELS)
+
+
+_models_by_document = {}
+
+
+def models_read_by(schema, document, printed):
+    """The Django models whose rows can appear in ``document``'s result."""
+    key = (id(schema), printed)
+    models = _models_by_document.get(key)
+    if models is None:
+        type_info = TypeInfo(schema)
+        collector = _ModelCollector(type_info)
+        visit(document, TypeInfoVisitor(type_info, collector))
+        models = sorted(
+            (m for m in collector.models if m in CACHED_MODELS), key=lambda m: m._meta.label_lower
+        )
+        if len(_models_by_document) > 1024:
+            _models_by_document.clear()
+        _models_by_document[key] = models
+    return models
+
+
+def is_cacheable(operation_ast):
+    return (
+        get_config()["ENABLED"]
+        and operation_ast is not None
+        and operation_ast.operation == OperationType.QUERY
+    )
+
+
+def response_key(schema, document, variables, operation_name, request):
+    user = getattr(request, "user", None)
+    user_key = user.pk if user is not None and user.is_authenticated else "anon"
+    printed = print_ast(document)
+    models = models_read_by(schema, document, printed)
+    payload = json.dumps(
+        [printed, variables or {}, operation_name, user_key,
+         [m._meta.label_lower for m in models], model_versions(models)],
+        sort_keys=True, cls=DjangoJSONEncoder,
+    )
+    return RESPONSE_PREFIX + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_response(key):
+    return get_cache().get(key)
+
+
+def set_response(key, data):
+    get_cache().set(key, data, get_config()["TIMEOUT"])
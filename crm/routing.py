@@ -0,0 +1,118 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+DEFAULTS = {
+    "ENABLED": False,
+    # Alias GraphQL query operations read from.
+    "READ_ALIAS": "replica",
+    # Alias for mutations, for every write, and for reads that follow a write.
+    "WRITE_ALIAS": "default",
+}
+
+_route = ContextVar("crm_db_route", default=None)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "CRM_DB_ROUTING", {})}
+
+
+class RequestRoute:
+    """
+    Routing state of one request. ``replica_reads`` is set while a query
+    operation runs; ``wrote`` once anything has been written, after which
+    every read in the request goes to the primary.
+    """
+
+    def __init__(self):
+        self.replica_reads = False
+        self.wrote = False
+
+
+@contextmanager
+def request_route():
+    """Routing state for one request or job; nested blocks share the outer one."""
+    if _route.get() is not None:
+        yield _route.get()
+        return
+    route = RequestRoute()
+    token = _route.set(route)
+    try:
+        yield route
+    finally:
+        _route.reset(token)
+
+
+@contextmanager
+def route_operation(operation_type):
+    """Send the reads of a query operation to the read alias while the block runs."""
+    with request_route() as route:
+        previous = route.replica_reads
+        route.replica_reads = operation_type == "query"
+        try:
+            yield route
+        finally:
+            route.replica_reads = previous
+
+
+class ReadReplicaRouter:
+    """
+    Reads go to READ_ALIAS only inside route_operation("query") and only
+    until the request writes; everything else uses WRITE_ALIAS.
+    """
+
+    def db_for_read(self, model, **hints):
+        config = get_config()
+        if not config["ENABLED"]:
+            return None
+        route = _route.get()
+        if route is not None and route.replica_reads and not route.wrote:
+            return config["READ_ALIAS"]
+        return config["WRITE_ALIAS"]
+
+    def db_for_write(self, model, **hints):
+        config = get_config()
+        if not config["ENABLED"]:
+            return None
+        route = _route.get()
+        if route is not None:
+            route.wrote = True
+        return config["WRITE_ALIAS"]
+
+    def allow_relation(self, obj1, obj2, **hints):
+        config = get_config()
+        aliases = {config["READ_ALIAS"], config["WRITE_ALIAS"]}
+        if config["ENABLED"] and {obj1._state.db, obj2._state.db} <= aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema with the data, from the primary.
+        config = get_config()
+        if config["ENABLED"] and db == config["READ_ALIAS"]:
+            return False
+        return None
+
+
+class DatabaseRoutingMiddleware:
+    """Gives every request its own RequestRoute, so a write pins the rest of it."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with request_route():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with request_route():
+            return await self.get_response(request)
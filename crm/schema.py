@@ -1,30 +1,65 @@
-import re
 import graphene
 from graphene_django import DjangoObjectType
-from django.db import transaction
-from django.utils import timezone
-from graphene_django.filter import DjangoFilterConnectionField
 from crm.models import Customer, Product, Order
-from crm.filters import CustomerFilter, ProductFilter, OrderFilter
-from crm.models import Product
-from crm.models import Customer, Order
+from crm.filters import CustomerFilter, ProductFilter, OrderFilter, apply_order_by
+from crm.fields import BatchedFilterConnectionField, CountableConnection, has_filter_args, is_prefetched
+from crm.bulk import DEFAULT_CHUNK_SIZE, PHONE_RE, bulk_create_customers
+from crm.inventory import (
+    DEFAULT_LOW_STOCK_THRESHOLD, DEFAULT_RESTOCK_CHUNK_SIZE, DEFAULT_RESTOCK_INCREMENT, restock_low_stock,
+)
+from crm.loaders import get_loaders
+from crm.analytics import period_totals
+from crm.orders import create_order
+from crm.search import search_queryset
+from crm.stats import get_request_stats
+from crm.async_utils import run_sync, then
 # =====================================
 # GraphQL Object Types
 # =====================================
 class CustomerType(DjangoObjectType):
+    orders = BatchedFilterConnectionField(lambda: OrderType)
+
     class Meta:
         model = Customer
-        fields = ("id", "name", "email", "phone")
+        filterset_class = CustomerFilter
+        interfaces = (graphene.relay.Node,)
+        connection_class = CountableConnection
+
+    def resolve_orders(self, info, **kwargs):
+        if has_filter_args(kwargs):
+            return self.orders.all()
+        if is_prefetched(self, "orders"):
+            return list(self.orders.all())
+        return get_loaders(info.context).customer_orders.load(self.pk)
 
 class ProductType(DjangoObjectType):
     class Meta:
         model = Product
-        fields = ("id", "name", "price", "stock")
+        filterset_class = ProductFilter
+        interfaces = (graphene.relay.Node,)
+        connection_class = CountableConnection
 
 class OrderType(DjangoObjectType):
+    products = BatchedFilterConnectionField(ProductType)
+
     class Meta:
         model = Order
-        fields = ("id", "customer", "products", "total_amount", "order_date")
+        filterset_class = OrderFilter
+        interfaces = (graphene.relay.Node,)
+        connection_class = CountableConnection
+
+    def resolve_customer(self, info):
+        if Order.customer.is_cached(self):
+            return self.customer
+        # A first load flushes the batch, which queries the database.
+        return run_sync(get_loaders(info.context).customer.load, self.customer_id)
+
+    def resolve_products(self, info, **kwargs):
+        if has_filter_args(kwargs):
+            return self.products.all()
+        if is_prefetched(self, "products"):
+            return list(self.products.all())
+        return get_loaders(info.context).order_products.load(self.pk)
 
 # =====================================
 # Input Types
@@ -56,7 +91,7 @@ class CreateCustomer(graphene.Mutation):
             raise Exception("Email already exists")
 
         # Validate phone format
-        if phone and not re.match(r"^\+?\d{3,15}$", phone):
+        if phone and not PHONE_RE.match(phone):
             raise Exception("Invalid phone format. Use +1234567890")
 
         # Create customer
@@ -68,33 +103,18 @@ class CreateCustomer(graphene.Mutation):
 class BulkCreateCustomers(graphene.Mutation):
     class Arguments:
         input = graphene.List(CustomerInput, required=True)
+        chunk_size = graphene.Int(required=False, default_value=DEFAULT_CHUNK_SIZE)
+        commit_each_chunk = graphene.Boolean(required=False, default_value=False)
 
     customers = graphene.List(CustomerType)
     errors = graphene.List(graphene.String)
 
-    @transaction.atomic
-    def mutate(self, info, input):
-        created = []
-        errors = []
-        for data in input:
-            try:
-                if Customer.objects.filter(email=data.email).exists():
-                    errors.append(f"{data.email}: Email already exists")
-                    continue
-
-                if data.phone and not re.match(r"^\+?\d{3,15}$", data.phone):
-                    errors.append(f"{data.email}: Invalid phone format")
-                    continue
-
-                customer = Customer.objects.create(
-                    name=data.name,
-                    email=data.email,
-                    phone=data.phone
-                )
-                created.append(customer)
-            except Exception as e:
-                errors.append(str(e))
-
+    def mutate(self, info, input, chunk_size=DEFAULT_CHUNK_SIZE, commit_each_chunk=False):
+        if chunk_size < 1:
+            raise Exception("chunk_size must be positive.")
+        created, errors = bulk_create_customers(
+            input, chunk_size=chunk_size, commit_each_chunk=commit_each_chunk
+        )
         return BulkCreateCustomers(customers=created, errors=errors)
 
 
@@ -127,30 +147,7 @@ class CreateOrder(graphene.Mutation):
     order = graphene.Field(OrderType)
 
     def mutate(self, info, customer_id, product_ids, order_date=None):
-        # Validate customer
-        try:
-            customer = Customer.objects.get(id=customer_id)
-        except Customer.DoesNotExist:
-            raise Exception("Invalid customer ID.")
-
-        # Validate product IDs
-        if not product_ids:
-            raise Exception("At least one product must be provided.")
-
-        products = Product.objects.filter(id__in=product_ids)
-        if products.count() != len(product_ids):
-            raise Exception("One or more invalid product IDs.")
-
-        # Create order and calculate total
-        order = Order.objects.create(
-            customer=customer,
-            order_date=order_date or timezone.now()
-        )
-        order.products.set(products)
-        total = sum(p.price for p in products)
-        order.total_amount = total
-        order.save()
-
+        order = create_order(customer_id, product_ids, order_date)
         return CreateOrder(order=order)
 
 
@@ -173,100 +170,154 @@ class Query(graphene.ObjectType):
         return Order.objects.all()
 
 
+class CRMQuery(graphene.ObjectType):
+    hello = graphene.String(default_value="Hello, GraphQL!")
+    all_customers = BatchedFilterConnectionField(
+        CustomerType, order_by=graphene.String(), search=graphene.String()
+    )
+    all_products = BatchedFilterConnectionField(
+        ProductType, order_by=graphene.String(), search=graphene.String()
+    )
+    all_orders = BatchedFilterConnectionField(
+        OrderType, order_by=graphene.String(), search=graphene.String()
+    )
+
+    # search ranks best match first unless orderBy asks for another order.
+    # A keyset cursor can only hold column values, so keyset pages of a
+    # search without orderBy come by id instead.
+    def resolve_all_customers(self, info, order_by=None, search=None, keyset=False, **kwargs):
+        customers = search_queryset(Customer.objects.all(), search, rank=not (order_by or keyset))
+        return apply_order_by(customers, order_by, CustomerFilter)
+
+    def resolve_all_products(self, info, order_by=None, search=None, keyset=False, **kwargs):
+        products = search_queryset(Product.objects.all(), search, rank=not (order_by or keyset))
+        return apply_order_by(products, order_by, ProductFilter)
+
+    def resolve_all_orders(self, info, order_by=None, search=None, **kwargs):
+        return apply_order_by(search_queryset(Order.objects.all(), search), order_by, OrderFilter)
+
+class StatsQuery(graphene.ObjectType):
+    total_customers = graphene.Int()
+    total_orders = graphene.Int()
+    total_revenue = graphene.Float()
+
+    def resolve_total_customers(self, info):
+        return then(get_request_stats(info.context), lambda stats: stats.total_customers)
+
+    def resolve_total_orders(self, info):
+        return then(get_request_stats(info.context), lambda stats: stats.total_orders)
+
+    def resolve_total_revenue(self, info):
+        return then(get_request_stats(info.context), lambda stats: stats.total_revenue)
+
+
 # =====================================
-# Root Mutation
+# Analytics
 # =====================================
-class Mutation(graphene.ObjectType):
-    create_customer = CreateCustomer.Field()
-    bulk_create_customers = BulkCreateCustomers.Field()
-    create_product = CreateProduct.Field()
-    create_order = CreateOrder.Field()
+class PeriodTotalType(graphene.ObjectType):
+    period = graphene.Date(description="First day of the bucket.")
+    orders = graphene.Int()
+    revenue = graphene.Float()
+    customer = graphene.Field(CustomerType)
+    product = graphene.Field(ProductType)
 
 
-class CustomerType(DjangoObjectType):
-    class Meta:
-        model = Customer
-        filterset_class = CustomerFilter
-        interfaces = (graphene.relay.Node,)
+def _optional_id(value, name):
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise Exception(f"Invalid {name} ID.")
 
-class ProductType(DjangoObjectType):
-    class Meta:
-        model = Product
-        filterset_class = ProductFilter
-        interfaces = (graphene.relay.Node,)
 
-class OrderType(DjangoObjectType):
-    class Meta:
-        model = Order
-        filterset_class = OrderFilter
-        interfaces = (graphene.relay.Node,)
+def resolve_period_totals(rank_by, period="day", since=None, until=None, customer_id=None,
+                          product_id=None, breakdown=None, top=None):
+    try:
+        rows = period_totals(
+            period, since, until, _optional_id(customer_id, "customer"),
+            _optional_id(product_id, "product"), breakdown, rank_by, top,
+        )
+    except ValueError as e:
+        raise Exception(str(e))
+    customers = Customer.objects.in_bulk({r["customer_id"] for r in rows} - {None})
+    products = Product.objects.in_bulk({r["product_id"] for r in rows} - {None})
+    return [
+        PeriodTotalType(
+            period=r["period"], orders=r["orders"], revenue=r["revenue"],
+            customer=customers.get(r["customer_id"]), product=products.get(r["product_id"]),
+        )
+        for r in rows
+    ]
+
+
+def period_arguments():
+    return {
+        "period": graphene.String(default_value="day", description="day, week or month."),
+        "since": graphene.Date(),
+        "until": graphene.Date(),
+        "customer_id": graphene.ID(),
+        "product_id": graphene.ID(),
+        "breakdown": graphene.String(description="customer or product."),
+        "top": graphene.Int(default_value=10, description="Rows kept per bucket in a breakdown."),
+    }
+
+
+class AnalyticsQuery(graphene.ObjectType):
+    """
+    Orders and revenue per day, week or month, from the roll-up that
+    crm.tasks.roll_up_order_analytics maintains (see crm.analytics).
+    """
+    revenue_by_period = graphene.List(PeriodTotalType, **period_arguments())
+    orders_by_period = graphene.List(PeriodTotalType, **period_arguments())
+
+    def resolve_revenue_by_period(self, info, **kwargs):
+        return run_sync(resolve_period_totals, "revenue", **kwargs)
+
+    def resolve_orders_by_period(self, info, **kwargs):
+        return run_sync(resolve_period_totals, "orders", **kwargs)
 
-class CRMQuery(graphene.ObjectType):
-    all_customers = DjangoFilterConnectionField(CustomerType, order_by=graphene.String())
-    all_products = DjangoFilterConnectionField(ProductType, order_by=graphene.String())
-    all_orders = DjangoFilterConnectionField(OrderType, order_by=graphene.String())
-
-    def resolve_all_customers(self, info, order_by=None, **kwargs):
-        qs = Customer.objects.all()
-        if order_by:
-            qs = qs.order_by(order_by)
-        return qs
-
-    def resolve_all_products(self, info, order_by=None, **kwargs):
-        qs = Product.objects.all()
-        if order_by:
-            qs = qs.order_by(order_by)
-        return qs
-
-    def resolve_all_orders(self, info, order_by=None, **kwargs):
-        qs = Order.objects.all()
-        if order_by:
-            qs = qs.order_by(order_by)
-        return qs
 
 # This is the requirement for the project checker:
-class Query(CRMQuery, graphene.ObjectType):
+class Query(CRMQuery, StatsQuery, AnalyticsQuery, graphene.ObjectType):
     pass
 
 
 
 class UpdateLowStockProducts(graphene.Mutation):
+    class Arguments:
+        threshold = graphene.Int(required=False, default_value=DEFAULT_LOW_STOCK_THRESHOLD)
+        increment = graphene.Int(required=False, default_value=DEFAULT_RESTOCK_INCREMENT)
+        chunk_size = graphene.Int(required=False, default_value=DEFAULT_RESTOCK_CHUNK_SIZE)
+
     message = graphene.String()
     updated_products = graphene.List(graphene.String)
 
-    def mutate(self, info):
-        low_stock_products = Product.objects.filter(stock__lt=10)
-        updated_names = []
+    def mutate(self, info, threshold=DEFAULT_LOW_STOCK_THRESHOLD,
+               increment=DEFAULT_RESTOCK_INCREMENT, chunk_size=DEFAULT_RESTOCK_CHUNK_SIZE):
+        if increment <= 0:
+            raise Exception("Increment must be positive.")
+        if chunk_size < 1:
+            raise Exception("chunk_size must be positive.")
 
-        for product in low_stock_products:
-            product.stock += 10  # simulate restocking
-            product.save()
-            updated_names.append(f"{product.name}: {product.stock}")
+        updated = restock_low_stock(threshold, increment, chunk_size)
+        updated_names = [f"{name}: {stock}" for name, stock in updated]
 
         msg = "Low stock products updated successfully." if updated_names else "No low stock products found."
         return UpdateLowStockProducts(message=msg, updated_products=updated_names)
 
+# =====================================
+# Root Mutation
+# =====================================
 class Mutation(graphene.ObjectType):
+    create_customer = CreateCustomer.Field()
+    bulk_create_customers = BulkCreateCustomers.Field()
+    create_product = CreateProduct.Field()
+    create_order = CreateOrder.Field()
     update_low_stock_products = UpdateLowStockProducts.Field()
 
 # ✅ Ensure Query class is already present
-class Query(CRMQuery, graphene.ObjectType):
+class Query(CRMQuery, StatsQuery, AnalyticsQuery, graphene.ObjectType):
     pass
 
 schema = graphene.Schema(query=Query, mutation=Mutation)
-
-
-
-class CRMQuery(graphene.ObjectType):
-    total_customers = graphene.Int()
-    total_orders = graphene.Int()
-    total_revenue = graphene.Float()
-
-    def resolve_total_customers(self, info):
-        return Customer.objects.count()
-
-    def resolve_total_orders(self, info):
-        return Order.objects.count()
-
-    def resolve_total_revenue(self, info):
-        return sum(order.total_amount for order in Order.objects.all())
@@ -0,0 +1,171 @@
+import re
+
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+
+from crm.models import Customer, Order, OrderLine, Product
+
+# Search terms beyond this many are ignored.
+MAX_TERMS = 8
+
+# model -> (FTS5 table, indexed columns)
+INDEXES = {
+    Customer: ("crm_customer_fts", ("name", "email")),
+    Product: ("crm_product_fts", ("name",)),
+}
+
+TERM_RE = re.compile(r"\w+")
+
+
+def match_expression(text):
+    """
+    Turn user input into an FTS5 query: every word must match as a prefix
+    (``ali exa`` matches ``Alice``, ``alice@example.com``). Returns None
+    when the input has no words.
+    """
+    terms = TERM_RE.findall(text or "")[:MAX_TERMS]
+    return " ".join(f'"{term}"*' for term in terms) or None
+
+
+# =====================================
+# FTS5 shadow tables
+# =====================================
+def index_sql(model):
+    """
+    DDL for the external-content FTS5 table of ``model`` and the triggers
+    that keep it in step. Triggers, unlike signals, also see bulk_create,
+    raw inserts (crm.seeding) and raw deletes (crm.cleanup).
+    """
+    table, columns = INDEXES[model]
+    source = model._meta.db_table
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+        f"{cols}, content='{source}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON {source} BEGIN "
+        f"INSERT INTO {table}(rowid, {cols}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON {source} BEGIN "
+        f"INSERT INTO {table}({table}, rowid, {cols}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF {cols} ON {source} BEGIN "
+        f"INSERT INTO {table}({table}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {table}(rowid, {cols}) VALUES (new.id, {new}); END",
+    ]
+
+
+def fts_available(conn=connection):
+    """True if ``conn`` is SQLite with FTS5; asked once per connection object."""
+    if conn.vendor != "sqlite":
+        return False
+    available = getattr(conn, "crm_fts5", None)
+    if available is None:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            available = bool(cursor.fetchone()[0])
+            if not available:
+                # FTS5 may also be loaded as an extension.
+                try:
+                    cursor.execute("SELECT 1 FROM pragma_module_list WHERE name = 'fts5'")
+                    available = cursor.fetchone() is not None
+                except OperationalError:
+                    pass
+        conn.crm_fts5 = available
+    return available
+
+
+def install(conn=connection, rebuild=False):
+    """
+    Create any missing FTS5 tables and triggers. New tables, and all of
+    them with ``rebuild``, are refilled from their source tables. Returns
+    the tables that were refilled.
+    """
+    if not fts_available(conn):
+        return []
+    refilled = []
+    with conn.cursor() as cursor:
+        existing = set(conn.introspection.table_names(cursor))
+        for model, (table, _) in INDEXES.items():
+            for statement in index_sql(model):
+                cursor.execute(statement)
+            if rebuild or table not in existing:
+                cursor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+                refilled.append(table)
+    return refilled
+
+
+@receiver(post_migrate)
+def install_after_migrate(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    # SQLite migrations that remake a table drop its triggers; put them back.
+    if sender.name == "crm" and router.allow_migrate(using, "crm"):
+        install(connections[using])
+
+
+# =====================================
+# Querysets
+# =====================================
+def _matching_ids(model, expression):
+    table, _ = INDEXES[model]
+    return RawSQL(f"SELECT rowid FROM {table} WHERE {table} MATCH %s", [expression])
+
+
+def _rank(model, expression):
+    # bm25 through FTS5's rank column: lower is better. Looked up by rowid,
+    # so only the rows already matched pay for it.
+    table, _ = INDEXES[model]
+    source = connection.ops.quote_name(model._meta.db_table)
+    return RawSQL(
+        f"(SELECT rank FROM {table} WHERE {table} MATCH %s AND rowid = {source}.id)",
+        [expression],
+    )
+
+
+def search_queryset(queryset, text, rank=True):
+    """
+    Narrow ``queryset`` to rows matching ``text``.
+
+    Customers match on name and email, products on name, and orders on
+    their customer's name or email or any of their products' names. With
+    ``rank``, customers and products come best match first. Without FTS5
+    (another database, or a SQLite built without it) this falls back to
+    ``icontains`` on the same columns.
+    """
+    expression = match_expression(text)
+    if expression is None:
+        return queryset
+    model = queryset.model
+    if not fts_available(connection):
+        return _contains_queryset(queryset, text)
+
+    if model is Order:
+        lines = OrderLine.objects.filter(product_id__in=_matching_ids(Product, expression))
+        return queryset.filter(
+            Q(customer_id__in=_matching_ids(Customer, expression))
+            | Q(pk__in=lines.values("order_id"))
+        )
+    queryset = queryset.filter(pk__in=_matching_ids(model, expression))
+    if rank:
+        queryset = queryset.annotate(search_rank=_rank(model, expression)).order_by("search_rank")
+    return queryset
+
+
+def _contains_queryset(queryset, text):
+    condition = Q()
+    for term in TERM_RE.findall(text)[:MAX_TERMS]:
+        if queryset.model is Order:
+            lines = OrderLine.objects.filter(product__name__icontains=term)
+            condition &= (
+                Q(customer__name__icontains=term) | Q(customer__email__icontains=term)
+                | Q(pk__in=lines.values("order_id"))
+            )
+        else:
+            _, columns = INDEXES[queryset.model]
+            term_condition = Q()
+            for column in columns:
+                term_condition |= Q(**{f"{column}__icontains": term})
+            condition &= term_condition
+    return queryset.filter(condition)
@@ -0,0 +1,199 @@
+import bisect
+import random
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from crm import analytics, response_cache, stats
+from crm.models import Customer, Order, OrderLine, Product
+
+DEFAULT_SEED = 42
+DEFAULT_BATCH_SIZE = 5000
+ORDER_HISTORY_DAYS = 730
+
+# Items per order: mostly one or two.
+BASKET_SIZES = (1, 2, 3, 4, 5)
+BASKET_WEIGHTS = (45, 25, 15, 10, 5)
+
+# Applied for the duration of a load only: no fsync, rollback journal in
+# memory, a 256 MB page cache. A crash mid-load can corrupt the file.
+BULK_LOAD_PRAGMAS = {
+    "synchronous": "OFF",
+    "journal_mode": "MEMORY",
+    "temp_store": "MEMORY",
+    "cache_size": "-262144",
+}
+
+
+def fixture_sizes(orders):
+    """``(customers, products)`` that go with ``orders`` orders."""
+    return max(10, orders // 10), max(20, min(5000, orders // 200))
+
+
+def _batches(total, size):
+    for start in range(0, total, size):
+        yield start, min(size, total - start)
+
+
+@contextmanager
+def bulk_load_pragmas(enabled=True):
+    """Trade durability for insert speed on SQLite while the block runs."""
+    if not enabled or connection.vendor != "sqlite":
+        yield
+        return
+    with connection.cursor() as cursor:
+        previous = {}
+        for name, value in BULK_LOAD_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}")
+            current = cursor.fetchone()[0]
+            # Leaving WAL needs every other connection closed, and gains little.
+            if name == "journal_mode" and current == "wal":
+                continue
+            previous[name] = current
+            cursor.execute(f"PRAGMA {name} = {value}")
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for name, value in previous.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+
+
+# =====================================
+# Distributions
+# =====================================
+def random_price(rng):
+    """Log-normal around 30, so most products are cheap and a few cost thousands."""
+    return Decimal(min(max(rng.lognormvariate(3.4, 1.1), 0.5), 9999.99)).quantize(Decimal("0.01"))
+
+
+def random_stock(rng):
+    """One product in ten is nearly sold out; the rest hold up to a few hundred."""
+    if rng.random() < 0.1:
+        return rng.randrange(0, 10)
+    return int(rng.expovariate(1 / 80)) + 10
+
+
+def random_order_age(rng):
+    """
+    Minutes before today. Volume grows linearly over the history, orders
+    cluster in the daytime, and weekends are quieter.
+    """
+    while True:
+        days = int(ORDER_HISTORY_DAYS * (1 - rng.random() ** 0.5))
+        if days % 7 not in (5, 6) or rng.random() < 0.6:
+            break
+    minute = int(min(max(rng.gauss(14 * 60, 4 * 60), 0), 24 * 60 - 1))
+    return days * 24 * 60 + (24 * 60 - minute)
+
+
+# =====================================
+# Loader
+# =====================================
+def seed_orders(orders, customers=None, products=None, seed=DEFAULT_SEED,
+                batch_size=DEFAULT_BATCH_SIZE, pragmas=True, progress=None):
+    """
+    Insert ``orders`` orders with ``customers`` customers and ``products``
+    products (sized by fixture_sizes() when omitted).
+
+    The same ``seed`` always produces the same rows. A few customers and
+    best-selling products account for most orders. Customers and products
+    go in with chunked bulk_create, orders and their lines with raw
+    executemany per chunk of ``batch_size``, all in one transaction. No
+    signals fire, so the stats row is rebuilt, the analytics roll-up
+    rewound and the response cache invalidated once at the end.
+    ``progress`` is called with ``(model name, rows so far, total)``.
+    Returns rows per model.
+    """
+    default_customers, default_products = fixture_sizes(orders)
+    customers = default_customers if customers is None else customers
+    products = default_products if products is None else products
+    if orders and not (customers and products):
+        raise ValueError("Orders need at least one customer and one product.")
+
+    rng = random.Random(seed)
+    today = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    report = progress or (lambda *args: None)
+
+    with bulk_load_pragmas(pragmas), transaction.atomic():
+        customer_ids = []
+        for start, size in _batches(customers, batch_size):
+            created = Customer.objects.bulk_create(
+                Customer(
+                    name=f"Customer {i}",
+                    # The seed keeps loads with different seeds from colliding.
+                    email=f"customer{i}.{seed}@example.com",
+                    phone=f"+1{rng.randrange(10 ** 9, 10 ** 10)}",
+                )
+                for i in range(start, start + size)
+            )
+            customer_ids.extend(c.pk for c in created)
+            report("customers", len(customer_ids), customers)
+
+        prices = {}
+        for start, size in _batches(products, batch_size):
+            created = Product.objects.bulk_create(
+                Product(name=f"Product {i}", price=random_price(rng), stock=random_stock(rng))
+                for i in range(start, start + size)
+            )
+            prices.update((p.pk, p.price) for p in created)
+            report("products", len(prices), products)
+
+        # Zipf-like popularity for products, a squared skew for customers.
+        product_ids = list(prices)
+        rng.shuffle(product_ids)
+        popularity = list(accumulate(1 / (rank + 1) ** 0.8 for rank in range(len(product_ids))))
+        top = popularity[-1]
+
+        def basket():
+            """``(product_id, quantity)`` pairs; a product picked twice is bought twice."""
+            size = rng.choices(BASKET_SIZES, BASKET_WEIGHTS)[0]
+            picked = Counter(product_ids[bisect.bisect(popularity, rng.random() * top)] for _ in range(size))
+            return sorted(picked.items())
+
+        # Orders skip the ORM too: building a model instance per row costs
+        # more than the insert. Ids are assigned here so the order lines can
+        # reference them without reading anything back.
+        qn = connection.ops.quote_name
+        insert_orders = "INSERT INTO {} ({}, {}, {}, {}) VALUES (%s, %s, %s, %s)".format(
+            qn(Order._meta.db_table), qn("id"), qn(Order._meta.get_field("customer").column),
+            qn("total_amount"), qn("order_date"),
+        )
+        insert_lines = "INSERT INTO {} ({}, {}, {}, {}) VALUES (%s, %s, %s, %s)".format(
+            qn(OrderLine._meta.db_table), qn(OrderLine._meta.get_field("order").column),
+            qn(OrderLine._meta.get_field("product").column), qn("quantity"), qn("unit_price"),
+        )
+        adapt_decimal = connection.ops.adapt_decimalfield_value
+        adapt_datetime = connection.ops.adapt_datetimefield_value
+        next_id = (Order.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+        for start, size in _batches(orders, batch_size):
+            order_rows, line_rows = [], []
+            for order_id in range(next_id + start, next_id + start + size):
+                items = basket()
+                order_rows.append((
+                    order_id,
+                    customer_ids[int(len(customer_ids) * rng.random() ** 2)],
+                    adapt_decimal(sum(prices[pid] * quantity for pid, quantity in items), 12, 2),
+                    adapt_datetime(today - timedelta(minutes=random_order_age(rng))),
+                ))
+                line_rows.extend(
+                    (order_id, pid, quantity, adapt_decimal(prices[pid], 10, 2))
+                    for pid, quantity in items
+                )
+            with connection.cursor() as cursor:
+                cursor.executemany(insert_orders, order_rows)
+                cursor.executemany(insert_lines, line_rows)
+            report("orders", start + size, orders)
+
+        stats.rebuild()
+        if orders:
+            analytics.rewind(today - timedelta(days=ORDER_HISTORY_DAYS + 1))
+        for model in (Customer, Product, Order):
+            response_cache.bump_model_version(model)
+    return {"customers": customers, "products": products, "orders": orders}
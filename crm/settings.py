@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -62,6 +63,10 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'crm.tasks.generate_crm_report',
         'schedule': crontab(day_of_week='mon', hour=6, minute=0),  # Every Monday 6 AM
     },
+    'roll-up-order-analytics': {
+        'task': 'crm.tasks.roll_up_order_analytics',
+        'schedule': crontab(minute=5),  # Hourly; only closed days are rolled up
+    },
 }
 CRONJOBS = [
     ('*/5 * * * *', 'crm.cron.log_crm_heartbeat'),
@@ -110,6 +115,23 @@ DATABASES = {
     }
 }
 
+# CRM_DB_PROFILE=production keeps connections open across requests, starts
+# write transactions with BEGIN IMMEDIATE (no lock-upgrade deadlocks under
+# WAL) and applies the CRM_SQLITE pragmas to every new connection.
+CRM_DB_PROFILE = os.environ.get('CRM_DB_PROFILE', 'development')
+
+if CRM_DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 5},
+    })
+
+# See crm/database.py for the pragma defaults.
+CRM_SQLITE = {
+    'ENABLED': CRM_DB_PROFILE == 'production',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -153,5 +175,5 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 GRAPHENE = {
-    "SCHEMA": "alx_backend_graphql_crm.schema.schema"
+    "SCHEMA": "alx_backend_graphql.schema.schema"
 }
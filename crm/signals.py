@@ -0,0 +1,145 @@
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from crm import analytics, response_cache, stats
+from crm.models import Customer, Order, OrderLine, Product
+from crm.orders import adjust_order_total, refresh_order_totals
+
+
+# =====================================
+# CRM statistics
+# =====================================
+@receiver(post_init, sender=Order)
+def remember_order_total(sender, instance, **kwargs):
+    # Deferred (only()) instances leave these unset; pre_save fetches them.
+    instance._stats_total = instance.__dict__.get("total_amount")
+    instance._saved_order_date = instance.__dict__.get("order_date")
+
+
+@receiver(pre_save, sender=Order)
+@receiver(pre_delete, sender=Order)
+def load_previous_order_total(sender, instance, origin=None, **kwargs):
+    if instance._state.adding:
+        return
+    # Line changes move total_amount in SQL (crm.orders.adjust_order_total),
+    # so an instance in memory may hold an old total. Orders the deletion
+    # collector just loaded are current; anything else is read again.
+    if origin is not None and origin is not instance and instance._stats_total is not None:
+        return
+    previous = Order.objects.filter(pk=instance.pk).values_list("total_amount", "order_date").first()
+    instance._stats_total, instance._saved_order_date = previous or (None, None)
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, **kwargs):
+    new_total = stats.to_decimal(instance.__dict__.get("total_amount", instance._stats_total))
+    if created:
+        stats.adjust(orders=1, revenue=new_total)
+    else:
+        stats.adjust(revenue=new_total - stats.to_decimal(instance._stats_total))
+    instance._stats_total = new_total
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    stats.adjust(orders=-1, revenue=-stats.to_decimal(instance._stats_total))
+
+
+@receiver(post_save, sender=Customer)
+def customer_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.adjust(customers=1)
+
+
+@receiver(post_delete, sender=Customer)
+def customer_deleted(sender, instance, **kwargs):
+    stats.adjust(customers=-1)
+
+
+# =====================================
+# Order analytics rollup
+# =====================================
+@receiver(post_save, sender=Order)
+def order_date_written(sender, instance, **kwargs):
+    # Both days change if the order moved; line changes rewind in crm.orders.
+    order_date = instance.__dict__.get("order_date")
+    analytics.rewind(instance._saved_order_date, order_date)
+    instance._saved_order_date = order_date
+
+
+@receiver(post_delete, sender=Order)
+def order_date_deleted(sender, instance, **kwargs):
+    analytics.rewind(instance._saved_order_date)
+
+
+# =====================================
+# Order totals from lines
+# =====================================
+def _line_total(values):
+    if values.get("quantity") is None or values.get("unit_price") is None:
+        return None
+    return values["quantity"] * stats.to_decimal(values["unit_price"])
+
+
+@receiver(post_init, sender=OrderLine)
+def remember_line_total(sender, instance, **kwargs):
+    # Deferred (only()) instances leave this unset; pre_save fetches it.
+    instance._saved_line_total = _line_total(instance.__dict__)
+
+
+@receiver(pre_save, sender=OrderLine)
+def load_previous_line_total(sender, instance, **kwargs):
+    if instance._state.adding or instance._saved_line_total is not None:
+        return
+    previous = OrderLine.objects.filter(pk=instance.pk).values("quantity", "unit_price").first()
+    instance._saved_line_total = _line_total(previous or {})
+
+
+@receiver(post_save, sender=OrderLine)
+def line_saved(sender, instance, created, **kwargs):
+    new_total = _line_total(instance.__dict__) or 0
+    previous = 0 if created else instance._saved_line_total or 0
+    adjust_order_total(instance.order_id, new_total - previous)
+    instance._saved_line_total = new_total
+    response_cache.bump_model_version(Order)
+
+
+@receiver(post_delete, sender=OrderLine)
+def line_deleted(sender, instance, origin=None, **kwargs):
+    # Lines cascading from their order (or its customer) go with the order;
+    # order_deleted already takes its whole total off revenue.
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin is not None and issubclass(model, (Order, Customer)):
+        return
+    adjust_order_total(instance.order_id, -(instance._saved_line_total or 0))
+    response_cache.bump_model_version(Order)
+
+
+@receiver(m2m_changed, sender=OrderLine)
+def order_products_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # order.products.add/remove/clear write lines in bulk without save signals.
+    if action.startswith("pre_"):
+        if not reverse:
+            instance._changed_orders = [instance.pk]
+        elif pk_set is not None:
+            instance._changed_orders = list(pk_set)
+        else:
+            instance._changed_orders = list(instance.order_lines.values_list("order_id", flat=True))
+        return
+    refresh_order_totals(instance._changed_orders)
+    response_cache.bump_model_version(Order)
+
+
+# =====================================
+# GraphQL response cache
+# =====================================
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Order)
+def invalidate_cached_responses(sender, **kwargs):
+    response_cache.bump_model_version(sender)
+
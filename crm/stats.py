@@ -0,0 +1,89 @@
+import asyncio
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+
+from crm.async_utils import on_event_loop
+from crm.models import Customer, CRMStats, Order
+
+STATS_PK = 1
+
+
+def to_decimal(value):
+    if value is None:
+        return Decimal("0")
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+def get_stats():
+    """Return the totals row, building it on first use."""
+    stats = CRMStats.objects.filter(pk=STATS_PK).first()
+    if stats is None:
+        stats = rebuild()
+    return stats
+
+
+async def aget_stats():
+    """Async counterpart of get_stats()."""
+    stats = await CRMStats.objects.filter(pk=STATS_PK).afirst()
+    if stats is None:
+        stats = await sync_to_async(rebuild)()
+    return stats
+
+
+def get_request_stats(context):
+    """
+    Return the totals row, read once per request however many total*
+    fields ask for it. On the async view this is a shared awaitable.
+    """
+    if context is None:
+        return aget_stats() if on_event_loop() else get_stats()
+    stats = getattr(context, "crm_stats", None)
+    if stats is None:
+        stats = asyncio.ensure_future(aget_stats()) if on_event_loop() else get_stats()
+        context.crm_stats = stats
+    return stats
+
+
+@transaction.atomic
+def rebuild():
+    """Recompute the totals row from the Customer and Order tables."""
+    revenue = Order.objects.aggregate(total=Coalesce(Sum("total_amount"), Decimal("0")))["total"]
+    stats, _ = CRMStats.objects.update_or_create(
+        pk=STATS_PK,
+        defaults={
+            "total_customers": Customer.objects.count(),
+            "total_orders": Order.objects.count(),
+            "total_revenue": revenue,
+        },
+    )
+    return stats
+
+
+def adjust(customers=0, orders=0, revenue=0):
+    """
+    Apply a delta to the totals row in a single UPDATE.
+
+    Runs inside the caller's transaction, so the totals commit or roll back
+    together with the rows that changed them. Bulk paths that bypass model
+    signals (bulk_create, queryset.update) must call this themselves.
+    """
+    revenue = to_decimal(revenue)
+    if not (customers or orders or revenue):
+        return
+    updated = CRMStats.objects.filter(pk=STATS_PK).update(
+        total_customers=F("total_customers") + customers,
+        total_orders=F("total_orders") + orders,
+        # Rounded in SQL: SQLite adds decimals as floats, and unrounded
+        # sums would drift from SUM(total_amount) one update at a time.
+        total_revenue=Round(F("total_revenue") + revenue, 2),
+        updated_at=timezone.now(),
+    )
+    if not updated:
+        rebuild()
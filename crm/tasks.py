@@ -1,38 +1,49 @@
-from datetime import datetime
-import requests
+from datetime import datetime, timedelta
 from celery import shared_task
+from django.utils import timezone
+
+from crm import analytics
+from crm.executor import execute_graphql
 
 
 @shared_task
 def generate_crm_report():
     """Generates a weekly CRM report and logs it."""
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     query = """
-    query {
+    query($since: Date) {
         totalCustomers
         totalOrders
         totalRevenue
+        revenueByPeriod(period: "week", since: $since) { period orders revenue }
     }
     """
+    # The last four weeks, this one included.
+    this_week = timezone.localdate() - timedelta(days=timezone.localdate().weekday())
+    variables = {"since": (this_week - timedelta(weeks=3)).isoformat()}
 
     try:
-        response = requests.post(
-            "http://localhost:8000/graphql",
-            json={"query": query},
-            timeout=10
-        )
+        result = execute_graphql(query, variables)
+        if result.get("errors"):
+            raise Exception(result["errors"][0]["message"])
 
-        data = response.json().get("data", {})
+        data = result.get("data") or {}
 
         total_customers = data.get("totalCustomers", 0)
         total_orders = data.get("totalOrders", 0)
         total_revenue = data.get("totalRevenue", 0.0)
+        weeks = ", ".join(
+            f"{week['period']}: {week['orders']} orders, {week['revenue']} revenue"
+            for week in data.get("revenueByPeriod") or []
+        )
 
         with open("/tmp/crm_report_log.txt", "a") as log_file:
             log_file.write(
                 f"{timestamp} - Report: {total_customers} customers, {total_orders} orders, {total_revenue} revenue\n"
             )
+            if weeks:
+                log_file.write(f"{timestamp} - Weekly trend: {weeks}\n")
 
         print("✅ CRM report generated successfully.")
 
@@ -40,3 +51,9 @@ def generate_crm_report():
         with open("/tmp/crm_report_log.txt", "a") as log_file:
             log_file.write(f"{timestamp} - ❌ Error: {e}\n")
         print(f"❌ Failed to generate report: {e}")
+
+
+@shared_task
+def roll_up_order_analytics():
+    """Extends the daily order roll-up from its high-water mark up to yesterday."""
+    return analytics.roll_up()
@@ -1,3 +1,336 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from graphql import get_operation_ast, parse
+
+from alx_backend_graphql.schema import schema
+from crm import analytics, stats, transfer
+from crm.complexity import analyse_operation
+from crm.cron_jobs.send_order_reminders import PAGE_SIZE, QUERY as REMINDERS_QUERY
+from crm.management.commands.benchmark_graphql import DEFAULT_QUERY
+from crm.models import Customer, Order, Product
+from crm.orders import add_order_lines, create_order
+
+KEYSET_ORDERS = """
+query Page($after: String) {
+  allOrders(first: 3, keyset: true, orderBy: "order_date", after: $after) {
+    pageInfo { hasNextPage endCursor }
+    edges { node { id } }
+  }
+}
+"""
+
+
+REPORT_QUERY = """
+query($since: Date) {
+    totalCustomers
+    totalOrders
+    totalRevenue
+    revenueByPeriod(period: "week", since: $since) { period orders revenue }
+}
+"""
+
+
+class CostAnalysisTests(TestCase):
+    def analyse(self, query, variables=None):
+        document = parse(query)
+        return analyse_operation(schema.graphql_schema, document, get_operation_ast(document), variables)
+
+    def test_connection_rows_are_charged_once(self):
+        report, errors = self.analyse("{ allOrders(first: 10) { edges { node { id } } } }")
+        self.assertEqual((report["nodes"], report["cost"]), (10, 10))
+        self.assertEqual(errors, [])
+
+    def test_nested_relations_use_the_nested_page_size(self):
+        report, errors = self.analyse(
+            "{ allOrders { edges { node { customer { email } products { edges { node { name } } } } } } }"
+        )
+        # 100 orders, 100 customers, 10 products per order weighted 2.
+        self.assertEqual((report["nodes"], report["cost"]), (1200, 2200))
+        self.assertEqual(errors, [])
+
+    def test_oversized_documents_are_rejected(self):
+        report, errors = self.analyse(
+            "{ allCustomers(first: 100) { edges { node { orders(first: 100) {"
+            " edges { node { products(first: 100) { edges { node { id } } } } } } } } } }"
+        )
+        self.assertEqual(report["nodes"], 100 + 100 * 100 + 100 * 100 * 100)
+        self.assertEqual({e.extensions["code"] for e in errors}, {"QUERY_TOO_COMPLEX"})
+
+    def test_shipped_documents_pass(self):
+        documents = (
+            (DEFAULT_QUERY, None),
+            (REMINDERS_QUERY, {"since": "2024-01-01", "first": PAGE_SIZE, "after": None}),
+            (REPORT_QUERY, {"since": "2024-01-01"}),
+        )
+        for query, variables in documents:
+            with self.subTest(query=query):
+                self.assertEqual(self.analyse(query, variables)[1], [])
+
+
+class KeysetPaginationTests(TestCase):
+    def test_pages_through_datetime_ordering(self):
+        customer = Customer.objects.create(name="Ada", email="ada@example.com")
+        start = timezone.now().replace(microsecond=0)
+        # Microseconds apart, so a cursor cut to milliseconds would repeat rows.
+        Order.objects.bulk_create(
+            Order(customer=customer, order_date=start + timedelta(microseconds=i * 7),
+                  total_amount=Decimal("1.00"))
+            for i in range(10)
+        )
+
+        seen, after = [], None
+        for _ in range(10):
+            response = self.client.post(
+                "/graphql", {"query": KEYSET_ORDERS, "variables": {"after": after}},
+                content_type="application/json",
+            )
+            connection = response.json()["data"]["allOrders"]
+            seen.extend(edge["node"]["id"] for edge in connection["edges"])
+            if not connection["pageInfo"]["hasNextPage"]:
+                break
+            after = connection["pageInfo"]["endCursor"]
+
+        self.assertEqual(len(seen), 10)
+        self.assertEqual(len(set(seen)), 10)
+
+    def test_pages_through_a_search(self):
+        Customer.objects.bulk_create(
+            Customer(name=f"Ada {i}", email=f"ada{i}@example.com") for i in range(5)
+        )
+        Customer.objects.create(name="Bob", email="bob@example.com")
+        query = """
+        query Page($after: String) {
+          allCustomers(search: "ada", keyset: true, first: 2, after: $after) {
+            pageInfo { hasNextPage endCursor }
+            edges { node { name } }
+          }
+        }
+        """
+        seen, after = [], None
+        for _ in range(5):
+            response = self.client.post(
+                "/graphql", {"query": query, "variables": {"after": after}},
+                content_type="application/json",
+            )
+            body = response.json()
+            self.assertNotIn("errors", body)
+            customers = body["data"]["allCustomers"]
+            seen.extend(edge["node"]["name"] for edge in customers["edges"])
+            if not customers["pageInfo"]["hasNextPage"]:
+                break
+            after = customers["pageInfo"]["endCursor"]
+
+        self.assertEqual(seen, [f"Ada {i}" for i in range(5)])
+
+
+class OrderFilterTests(TestCase):
+    def test_product_name_lists_each_order_once(self):
+        customer = Customer.objects.create(name="Ada", email="ada@example.com")
+        widgets = [Product.objects.create(name=f"Widget {i}", price=Decimal("2.00")) for i in range(3)]
+        create_order(customer.pk, [p.pk for p in widgets])
+
+        response = self.client.post(
+            "/graphql",
+            {"query": '{ allOrders(productName: "widget") { totalCount edges { node { id } } } }'},
+            content_type="application/json",
+        )
+        orders = response.json()["data"]["allOrders"]
+        self.assertEqual(orders["totalCount"], 1)
+        self.assertEqual(len(orders["edges"]), 1)
+
+
+class StatsTests(TestCase):
+    def assertTotalsMatchTables(self):
+        totals = stats.get_stats()
+        revenue = sum((o.total_amount for o in Order.objects.all()), Decimal("0"))
+        self.assertEqual(
+            (totals.total_customers, totals.total_orders, totals.total_revenue),
+            (Customer.objects.count(), Order.objects.count(), revenue),
+        )
+
+    def test_totals_follow_creates_updates_and_deletes(self):
+        stats.rebuild()
+        ada = Customer.objects.create(name="Ada", email="ada@example.com")
+        bob = Customer.objects.create(name="Bob", email="bob@example.com")
+        pen = Product.objects.create(name="Pen", price=Decimal("1.25"))
+        ink = Product.objects.create(name="Ink", price=Decimal("7.40"))
+        pad = Product.objects.create(name="Pad", price=Decimal("0.35"))
+        first = create_order(ada.pk, [pen.pk, ink.pk])
+        create_order(bob.pk, [ink.pk, ink.pk])
+        self.assertTotalsMatchTables()
+
+        add_order_lines(first.pk, {pad.pk: 3})
+        self.assertTotalsMatchTables()
+        first.refresh_from_db()
+        first.total_amount = Decimal("3.00")
+        first.save()
+        self.assertTotalsMatchTables()
+
+        first.delete()
+        self.assertTotalsMatchTables()
+        # Cascades to Bob's order.
+        bob.delete()
+        self.assertTotalsMatchTables()
+        self.assertEqual(stats.get_stats().total_revenue, Decimal("0"))
+
+    def test_revenue_adjustments_do_not_drift(self):
+        stats.rebuild()
+        for _ in range(300):
+            stats.adjust(revenue=Decimal("0.10"))
+        for _ in range(100):
+            stats.adjust(revenue=Decimal("-0.07"))
+        # Reading through the ORM quantizes; check what is stored.
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT total_revenue FROM crm_crmstats WHERE id = %s", [stats.STATS_PK])
+            stored = cursor.fetchone()[0]
+        self.assertEqual(Decimal(str(stored)), Decimal("23"))
+
+
+class PersistedQueryTests(TestCase):
+    def post(self, body):
+        return self.client.post("/graphql", body, content_type="application/json")
+
+    def test_malformed_extensions_are_rejected(self):
+        for extensions in ([1], "[1]", 5):
+            self.assertEqual(self.post({"query": "{ hello }", "extensions": extensions}).status_code, 400)
+
+    def test_malformed_persisted_query_is_an_error(self):
+        for persisted in ([1], {"version": 1, "sha256Hash": 5}, {"version": 1, "sha256Hash": ["x"]}):
+            response = self.post({"extensions": {"persistedQuery": persisted}})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("errors", response.json())
+
+    def test_cache_stats_need_staff_or_token(self):
+        self.assertEqual(self.client.get("/graphql/cache-stats").status_code, 403)
+        with self.settings(CRM_GRAPHQL_TRACING={"METRICS_TOKEN": "s3cret"}):
+            response = self.client.get("/graphql/cache-stats", HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+
+
+class RollupTests(TestCase):
+    def test_back_dated_order_is_rolled_up_again(self):
+        ada = Customer.objects.create(name="Ada", email="ada@example.com")
+        pen = Product.objects.create(name="Pen", price=Decimal("1.25"))
+        now = timezone.now()
+        create_order(ada.pk, [pen.pk], order_date=now - timedelta(days=10))
+        create_order(ada.pk, [pen.pk], order_date=now)
+        analytics.roll_up()
+        self.assertEqual(analytics.rolled_up_until(), analytics.today())
+
+        late = now - timedelta(days=5)
+        create_order(ada.pk, [pen.pk, pen.pk], order_date=late)
+        self.assertEqual(analytics.rolled_up_until(), timezone.localdate(late))
+
+        def totals():
+            return {
+                "day": list(analytics.period_totals()),
+                "customer": list(analytics.period_totals(customer_id=ada.pk)),
+                "product": list(analytics.period_totals(product_id=pen.pk)),
+            }
+
+        # Until the next roll-up, the rewound days come from the order tables.
+        pending = totals()
+        analytics.roll_up()
+        self.assertEqual(analytics.rolled_up_until(), analytics.today())
+        rolled = totals()
+        analytics.reset()
+        analytics.roll_up()
+        self.assertEqual(rolled, totals())
+        self.assertEqual(pending, rolled)
+        self.assertEqual(sum(row["orders"] for row in rolled["day"]), 3)
+        self.assertEqual(sum(row["revenue"] for row in rolled["day"]), Decimal("5.00"))
+
+
+class ImportReportTests(TestCase):
+    def test_bad_rows_are_reported_and_skipped(self):
+        Customer.objects.create(name="Old", email="old@example.com")
+        rows = enumerate([
+            {"name": "Ada", "email": "ada@example.com"},
+            {"name": "Bad", "email": "not-an-email"},
+            {"name": "", "email": "blank@example.com"},
+            {"name": "Ada again", "email": "ada@example.com"},
+            {"name": "Old", "email": "old@example.com"},
+            transfer.RowError("Expected a JSON object."),
+            {"name": "Bob", "email": "bob@example.com", "phone": "+15550100"},
+        ], start=1)
+        report = transfer.import_rows(transfer.get_dataset("customers"), rows, batch_size=2)
+
+        self.assertEqual(report.as_dict(), {
+            "rows": 7,
+            "created": 2,
+            "error_count": 5,
+            "errors": [
+                {"row": 2, "error": "Invalid email."},
+                {"row": 3, "error": "name is required."},
+                {"row": 4, "error": "Duplicate email in input."},
+                {"row": 5, "error": "Email already exists."},
+                {"row": 6, "error": "Expected a JSON object."},
+            ],
+        })
+        self.assertEqual(
+            sorted(Customer.objects.values_list("email", flat=True)),
+            ["ada@example.com", "bob@example.com", "old@example.com"],
+        )
+        self.assertEqual(stats.get_stats().total_customers, 3)
+
+    def test_reported_errors_are_capped(self):
+        rows = enumerate(({"name": "x", "email": "bad"} for _ in range(5)), start=1)
+        report = transfer.import_rows(transfer.get_dataset("customers"), rows, max_errors=2)
+        self.assertEqual(report.error_count, 5)
+        self.assertEqual(len(report.as_dict()["errors"]), 2)
+
+
+@override_settings(CRM_TRANSFER={"TOKEN": "s3cret"})
+class TransferAccessTests(TestCase):
+    def setUp(self):
+        Customer.objects.create(name="Ada", email="ada@example.com")
+
+    def test_export_needs_staff_or_token(self):
+        self.assertEqual(self.client.get("/export/customers.csv").status_code, 403)
+        response = self.client.get("/export/customers.csv", HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"ada@example.com", b"".join(response.streaming_content))
+
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        self.assertEqual(self.client.get("/export/customers.csv").status_code, 200)
+
+    async def test_export_streams_under_asgi(self):
+        response = await self.async_client.get(
+            "/export/customers.ndjson", headers={"Authorization": "Bearer s3cret"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        content = b"".join([piece async for piece in response.streaming_content])
+        self.assertIn(b'"email":"ada@example.com"', content)
+
+    def test_export_only_takes_filters_on_real_fields(self):
+        response = self.client.get(
+            "/export/customers.csv?createdAt_Gte=2020-01-01", HTTP_AUTHORIZATION="Bearer s3cret"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.content.decode(),
+            "Unknown filter 'createdAt_Gte'. Use search or one of: email, name, phone, phonePattern.",
+        )
+
+    def test_import_needs_token(self):
+        body = '{"name": "Bob", "email": "bob@example.com"}\n'
+
+        def post(**headers):
+            return self.client.post(
+                "/import/customers", body, content_type="application/x-ndjson", **headers
+            )
+
+        self.assertEqual(post().status_code, 403)
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        self.assertEqual(post().status_code, 403)
+        self.assertFalse(Customer.objects.filter(email="bob@example.com").exists())
+
+        response = post(HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["created"], 1)
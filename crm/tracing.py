@@ -0,0 +1,320 @@
+import hmac
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from inspect import isawaitable
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from graphql import get_named_type, is_leaf_type
+
+logger = logging.getLogger("crm.graphql.slow")
+
+DEFAULTS = {
+    "ENABLED": True,
+    # Operations at least this slow are written to the crm.graphql.slow log.
+    "SLOW_OPERATION_MS": 500,
+    # Resolver paths listed per slow operation, slowest first.
+    "SLOW_LOG_PATHS": 5,
+    # Distinct operation names kept in the metrics; later ones count as "other".
+    "MAX_OPERATION_NAMES": 200,
+    # Bearer token for /graphql/metrics and /graphql/cache-stats; staff sessions need none.
+    "METRICS_TOKEN": None,
+}
+
+# Operation names are client-supplied; longer ones are cut in the metrics.
+MAX_OPERATION_NAME_LENGTH = 64
+OTHER_OPERATIONS = "other"
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_current_trace = ContextVar("crm_graphql_trace", default=None)
+_current_path = ContextVar("crm_graphql_resolver", default=None)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "CRM_GRAPHQL_TRACING", {})}
+
+
+# =====================================
+# Per-operation trace
+# =====================================
+class OperationTrace:
+    """
+    Wall time and SQL of one operation, split by resolver.
+
+    Resolvers are keyed by ``(path, field)``: the response path without
+    list indices (``allOrders.edges.node.customer``) and the schema field
+    (``OrderType.customer``), so every row of a page adds to one entry.
+    SQL is charged to the resolver running when it executes; a loader that
+    flushes a batch charges the field that asked for the first key.
+    """
+
+    def __init__(self, name, operation_type):
+        self.name = name
+        self.operation_type = operation_type
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.sql_count = 0
+        self.sql_time = 0.0
+        # (path, field) -> [calls, seconds, sql statements, sql seconds]
+        self.resolvers = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, key):
+        entry = self.resolvers.get(key)
+        if entry is None:
+            entry = self.resolvers[key] = [0, 0.0, 0, 0.0]
+        return entry
+
+    def record_resolver(self, key, seconds):
+        with self._lock:
+            entry = self._entry(key)
+            entry[0] += 1
+            entry[1] += seconds
+
+    def record_sql(self, seconds):
+        key = _current_path.get()
+        with self._lock:
+            self.sql_count += 1
+            self.sql_time += seconds
+            if key is not None:
+                entry = self._entry(key)
+                entry[2] += 1
+                entry[3] += seconds
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.start
+
+
+@contextmanager
+def trace_operation(name, operation_type):
+    """Trace the operation executed inside the block, then publish it."""
+    config = get_config()
+    if not config["ENABLED"]:
+        yield None
+        return
+    trace = OperationTrace(name or "anonymous", operation_type)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        trace.finish()
+        slow = trace.duration * 1000 >= config["SLOW_OPERATION_MS"]
+        metrics.observe(trace, slow)
+        if slow:
+            log_slow_operation(trace, config["SLOW_LOG_PATHS"])
+
+
+def log_slow_operation(trace, paths):
+    slowest = sorted(trace.resolvers.items(), key=lambda item: item[1][1], reverse=True)[:paths]
+    logger.warning(
+        "Slow GraphQL %s %s: %.1f ms, %d SQL statements in %.1f ms%s",
+        trace.operation_type, trace.name, trace.duration * 1000,
+        trace.sql_count, trace.sql_time * 1000,
+        "".join(
+            f"\n  {path} ({field}): {calls} calls, {seconds * 1000:.1f} ms, "
+            f"{sql_count} SQL in {sql_time * 1000:.1f} ms"
+            for (path, field), (calls, seconds, sql_count, sql_time) in slowest
+        ),
+    )
+
+
+# =====================================
+# Graphene middleware and SQL wrapper
+# =====================================
+def resolver_key(info):
+    path = ".".join(str(p) for p in info.path.as_list() if not isinstance(p, int))
+    return path, f"{info.parent_type.name}.{info.field_name}"
+
+
+CONNECTION_PLUMBING = {"edges", "node", "pageInfo"}
+
+
+def is_traced(info):
+    """
+    Root fields and fields returning objects. Scalars below the root are
+    attribute reads, and edges/node/pageInfo only unwrap a resolved page.
+    """
+    if info.path.prev is None:
+        return True
+    if is_leaf_type(get_named_type(info.return_type)):
+        return False
+    return not (
+        info.field_name in CONNECTION_PLUMBING
+        and info.parent_type.name.endswith(("Connection", "Edge"))
+    )
+
+
+class TracingMiddleware:
+    """Times the resolvers picked by is_traced() while an operation is traced."""
+
+    def resolve(self, next, root, info, **args):
+        trace = _current_trace.get()
+        if trace is None or not is_traced(info):
+            return next(root, info, **args)
+
+        key = resolver_key(info)
+        token = _current_path.set(key)
+        start = time.perf_counter()
+        try:
+            result = next(root, info, **args)
+        finally:
+            _current_path.reset(token)
+        if isawaitable(result):
+            return self.resolve_async(trace, key, start, result)
+        trace.record_resolver(key, time.perf_counter() - start)
+        return result
+
+    async def resolve_async(self, trace, key, start, result):
+        # sync_to_async copies this context into the thread running the SQL.
+        token = _current_path.set(key)
+        try:
+            return await result
+        finally:
+            _current_path.reset(token)
+            trace.record_resolver(key, time.perf_counter() - start)
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    trace = _current_trace.get()
+    if trace is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        trace.record_sql(time.perf_counter() - start)
+
+
+@receiver(connection_created)
+def install_sql_wrapper(sender, connection, **kwargs):
+    # Wrappers live on the per-thread DatabaseWrapper, which outlives reconnects.
+    if sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_wrapper)
+
+
+# =====================================
+# Prometheus text exposition
+# =====================================
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class Metrics:
+    """
+    Process-local totals of every traced operation and resolver field.
+
+    Clients choose operation names and aliases, so neither may grow these
+    totals without bound: resolvers are keyed by schema field alone, which
+    the schema bounds, and operation names are cut to
+    MAX_OPERATION_NAME_LENGTH, with names past MAX_OPERATION_NAMES folded
+    into "other".
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # (name, type) -> [count, seconds, sql statements, sql seconds, bucket counts]
+            self.operations = {}
+            # field -> [calls, seconds, sql statements, sql seconds]
+            self.resolvers = {}
+            self.slow_operations = 0
+
+    def _operation_key(self, trace):
+        key = (trace.name[:MAX_OPERATION_NAME_LENGTH], trace.operation_type)
+        if key not in self.operations and len(self.operations) >= get_config()["MAX_OPERATION_NAMES"]:
+            key = (OTHER_OPERATIONS, trace.operation_type)
+        return key
+
+    def observe(self, trace, slow=False):
+        with self._lock:
+            self.slow_operations += slow
+            key = self._operation_key(trace)
+            op = self.operations.get(key)
+            if op is None:
+                op = self.operations[key] = [0, 0.0, 0, 0.0, [0] * len(DURATION_BUCKETS)]
+            op[0] += 1
+            op[1] += trace.duration
+            op[2] += trace.sql_count
+            op[3] += trace.sql_time
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if trace.duration <= bound:
+                    op[4][i] += 1
+            for (_, field), values in trace.resolvers.items():
+                entry = self.resolvers.setdefault(field, [0, 0.0, 0, 0.0])
+                for i, value in enumerate(values):
+                    entry[i] += value
+
+    def render(self):
+        with self._lock:
+            operations = {k: (v[:4] + [list(v[4])]) for k, v in self.operations.items()}
+            resolvers = {k: list(v) for k, v in self.resolvers.items()}
+            slow = self.slow_operations
+
+        lines = [
+            "# HELP crm_graphql_operation_seconds Wall time of GraphQL operations.",
+            "# TYPE crm_graphql_operation_seconds histogram",
+        ]
+        for (name, op_type), (count, seconds, _, _, buckets) in sorted(operations.items()):
+            for bound, bucket in zip(DURATION_BUCKETS, buckets):
+                lines.append(
+                    f"crm_graphql_operation_seconds_bucket"
+                    f"{_labels(operation=name, type=op_type, le=bound)} {bucket}"
+                )
+            labels = _labels(operation=name, type=op_type)
+            lines.append(f"crm_graphql_operation_seconds_bucket{_labels(operation=name, type=op_type, le='+Inf')} {count}")
+            lines.append(f"crm_graphql_operation_seconds_sum{labels} {seconds:.6f}")
+            lines.append(f"crm_graphql_operation_seconds_count{labels} {count}")
+
+        lines += [
+            "# HELP crm_graphql_operation_sql_statements_total SQL statements run by GraphQL operations.",
+            "# TYPE crm_graphql_operation_sql_statements_total counter",
+        ]
+        for (name, op_type), (_, _, sql_count, _, _) in sorted(operations.items()):
+            lines.append(f"crm_graphql_operation_sql_statements_total{_labels(operation=name, type=op_type)} {sql_count}")
+        lines += [
+            "# HELP crm_graphql_operation_sql_seconds_total Time spent in SQL by GraphQL operations.",
+            "# TYPE crm_graphql_operation_sql_seconds_total counter",
+        ]
+        for (name, op_type), (_, _, _, sql_time, _) in sorted(operations.items()):
+            lines.append(f"crm_graphql_operation_sql_seconds_total{_labels(operation=name, type=op_type)} {sql_time:.6f}")
+
+        for metric, index, help_text, fmt in (
+            ("crm_graphql_resolver_calls_total", 0, "Resolver calls per schema field.", "{}"),
+            ("crm_graphql_resolver_seconds_total", 1, "Resolver wall time per schema field.", "{:.6f}"),
+            ("crm_graphql_resolver_sql_statements_total", 2, "SQL statements run by each resolver field.", "{}"),
+            ("crm_graphql_resolver_sql_seconds_total", 3, "SQL time of each resolver field.", "{:.6f}"),
+        ):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            for field, values in sorted(resolvers.items()):
+                lines.append(f"{metric}{_labels(field=field)} {fmt.format(values[index])}")
+
+        lines += [
+            "# HELP crm_graphql_slow_operations_total Operations over SLOW_OPERATION_MS.",
+            "# TYPE crm_graphql_slow_operations_total counter",
+            f"crm_graphql_slow_operations_total {slow}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def can_read_metrics(request):
+    """Staff sessions, or a scraper presenting METRICS_TOKEN as a bearer token."""
+    user = getattr(request, "user", None)
+    if user is not None and user.is_staff:
+        return True
+    token = get_config()["METRICS_TOKEN"]
+    header = request.headers.get("Authorization", "")
+    return bool(token) and hmac.compare_digest(header, f"Bearer {token}")
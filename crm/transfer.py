@@ -0,0 +1,532 @@
+import codecs
+import csv
+import hmac
+import io
+import json
+import re
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django_filters.utils import get_model_field
+from graphene.utils.str_converters import to_camel_case
+
+from crm import analytics, response_cache, routing, stats
+from crm.bulk import PHONE_RE, insert_customers
+from crm.filters import CustomerFilter, OrderFilter, ProductFilter
+from crm.models import Customer, Order, OrderLine, Product
+from crm.search import search_queryset
+
+DEFAULTS = {
+    # Rows fetched per query while exporting; order lines come one query per chunk.
+    "EXPORT_CHUNK_SIZE": 2000,
+    # Rows validated and written per transaction while importing.
+    "IMPORT_BATCH_SIZE": 500,
+    # Row errors listed in an import report; the rest are only counted.
+    "MAX_REPORTED_ERRORS": 1000,
+    # Bearer token for scripted transfers. Imports need it; exports also
+    # answer staff sessions.
+    "TOKEN": None,
+}
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+CENTS = Decimal("0.01")
+# Ids, quantities and stock all fit a 32-bit integer column.
+MAX_INTEGER = 2 ** 31 - 1
+INTEGER_RE = re.compile(r"^\s*[+-]?[0-9]+\s*$")
+# Export output is yielded to the server in pieces of about this size.
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "CRM_TRANSFER", {})}
+
+
+def has_token(request):
+    """Whether the request presents TOKEN as a bearer token."""
+    token = get_config()["TOKEN"]
+    header = request.headers.get("Authorization", "")
+    return bool(token) and hmac.compare_digest(header, f"Bearer {token}")
+
+
+def can_export(request):
+    """Staff sessions, or a client presenting TOKEN as a bearer token."""
+    user = getattr(request, "user", None)
+    return (user is not None and user.is_staff) or has_token(request)
+
+
+class TransferError(Exception):
+    """A request the export or import cannot serve at all."""
+
+
+class RowError(Exception):
+    """One import row that cannot be written."""
+
+
+# =====================================
+# Datasets
+# =====================================
+class Dataset:
+    """How one model is exported and imported, row by row."""
+    model = None
+    filterset_class = None
+    columns = ()
+
+    def queryset(self):
+        return self.model.objects.order_by("pk")
+
+    def export_rows(self, queryset, chunk_size):
+        """
+        Yield the rows of ``queryset`` as dicts keyed by ``columns``,
+        fetched ``chunk_size`` at a time. values() rows skip model
+        instances and their post_init signals, most of an export's cost.
+        """
+        return queryset.values(*self.columns).iterator(chunk_size=chunk_size)
+
+    def csv_value(self, column, value):
+        return value
+
+    def parse(self, data):
+        """Validate one input mapping; raise RowError or return what write() takes."""
+        raise NotImplementedError
+
+    def write(self, batch):
+        """
+        Write ``[(row number, parsed row), ...]`` in the current transaction.
+        Returns ``(rows created, [(row number, error), ...])``.
+        """
+        raise NotImplementedError
+
+
+def _text(data, name, max_length, required=True):
+    value = data.get(name)
+    if value is None:
+        value = ""
+    if not isinstance(value, str):
+        raise RowError(f"{name} must be text.")
+    value = value.strip()
+    if required and not value:
+        raise RowError(f"{name} is required.")
+    if len(value) > max_length:
+        raise RowError(f"{name} is longer than {max_length} characters.")
+    return value
+
+
+def _integer(value, name, minimum=None):
+    # int() would also take 2.7 or True, and fail on a JSON NaN or Infinity.
+    if isinstance(value, str) and INTEGER_RE.match(value):
+        number = int(value)
+    elif isinstance(value, int) and not isinstance(value, bool):
+        number = value
+    else:
+        raise RowError(f"Invalid {name}.")
+    if minimum is not None and number < minimum:
+        raise RowError(f"{name} must be at least {minimum}.")
+    if number > MAX_INTEGER:
+        raise RowError(f"{name} is too large.")
+    return number
+
+
+def _decimal(value, name, max_digits=10):
+    """A non-negative amount in cents that fits a ``max_digits`` column."""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise RowError(f"Invalid {name}.")
+    try:
+        number = Decimal(str(value).strip())
+        if not number.is_finite():
+            raise InvalidOperation
+        if number.adjusted() >= max_digits - 2:
+            raise RowError(f"{name} is too large.")
+        number = number.quantize(CENTS)
+    except (InvalidOperation, ValueError):
+        raise RowError(f"Invalid {name}.")
+    if number < 0:
+        raise RowError(f"{name} cannot be negative.")
+    return number
+
+
+class CustomerDataset(Dataset):
+    model = Customer
+    filterset_class = CustomerFilter
+    columns = ("id", "name", "email", "phone")
+
+    def parse(self, data):
+        email = _text(data, "email", 254)
+        try:
+            validate_email(email)
+        except ValidationError:
+            raise RowError("Invalid email.")
+        phone = _text(data, "phone", 20, required=False) or None
+        if phone and not PHONE_RE.match(phone):
+            raise RowError("Invalid phone format. Use +1234567890")
+        return Customer(name=_text(data, "name", 100), email=email, phone=phone)
+
+    def write(self, batch):
+        errors = []
+        rows = {}
+        for number, customer in batch:
+            if customer.email in rows:
+                errors.append((number, "Duplicate email in input."))
+            else:
+                rows[customer.email] = number
+        existing = set(Customer.objects.filter(email__in=rows).values_list("email", flat=True))
+        errors.extend((rows.pop(email), "Email already exists.") for email in sorted(existing))
+        customers = [c for number, c in batch if rows.get(c.email) == number]
+
+        created, taken = insert_customers(customers)
+        errors.extend((rows[email], "Email already exists.") for email in taken)
+        # bulk_create skips post_save.
+        stats.adjust(customers=len(created))
+        if created:
+            response_cache.bump_model_version(Customer)
+        return len(created), errors
+
+
+class ProductDataset(Dataset):
+    model = Product
+    filterset_class = ProductFilter
+    columns = ("id", "name", "price", "stock")
+
+    def parse(self, data):
+        price = _decimal(data.get("price"), "price")
+        if not price:
+            raise RowError("Price must be positive.")
+        stock = data.get("stock")
+        stock = 0 if stock in (None, "") else _integer(stock, "stock", minimum=0)
+        return Product(name=_text(data, "name", 100), price=price, stock=stock)
+
+    def write(self, batch):
+        created = Product.objects.bulk_create(product for _, product in batch)
+        if created:
+            response_cache.bump_model_version(Product)
+        return len(created), []
+
+
+class OrderDataset(Dataset):
+    """
+    Orders with their lines. In CSV the lines column reads
+    ``product_id:quantity:unit_price`` per line, separated by ``;``; in
+    NDJSON it is a list of objects with those keys. An imported line
+    without a unit price sells at the product's current price.
+    """
+    model = Order
+    filterset_class = OrderFilter
+    columns = ("id", "customer_id", "order_date", "total_amount", "lines")
+    line_columns = ("product_id", "quantity", "unit_price")
+
+    def export_rows(self, queryset, chunk_size):
+        # prefetch_related by hand: one query for the lines of each chunk.
+        orders = queryset.values(*self.columns[:-1]).iterator(chunk_size=chunk_size)
+        while chunk := list(islice(orders, chunk_size)):
+            lines = {row["id"]: [] for row in chunk}
+            for order_id, *line in (
+                OrderLine.objects.using(queryset.db).filter(order_id__in=lines)
+                .order_by("order_id", "product_id").values_list("order_id", *self.line_columns)
+            ):
+                lines[order_id].append(dict(zip(self.line_columns, line)))
+            for row in chunk:
+                row["lines"] = lines[row["id"]]
+                yield row
+
+    def csv_value(self, column, value):
+        if column == "lines":
+            return ";".join(
+                f"{line['product_id']}:{line['quantity']}:{line['unit_price']}" for line in value
+            )
+        return value
+
+    def parse_lines(self, lines):
+        if isinstance(lines, str):
+            lines = [
+                dict(zip(("product_id", "quantity", "unit_price"), line.split(":")))
+                for line in lines.split(";") if line.strip()
+            ]
+        if not isinstance(lines, list) or not lines:
+            raise RowError("At least one line must be provided.")
+        parsed = {}
+        for line in lines:
+            if not isinstance(line, dict):
+                raise RowError("Invalid line.")
+            product_id = _integer(line.get("product_id"), "product ID")
+            if product_id in parsed:
+                raise RowError(f"Product {product_id} is listed more than once.")
+            quantity = line.get("quantity")
+            unit_price = line.get("unit_price")
+            parsed[product_id] = (
+                1 if quantity in (None, "") else _integer(quantity, "quantity", minimum=1),
+                None if unit_price in (None, "") else _decimal(unit_price, "unit price"),
+            )
+        return parsed
+
+    def parse(self, data):
+        order_date = data.get("order_date")
+        if order_date in (None, ""):
+            order_date = timezone.now()
+        else:
+            try:
+                order_date = parse_datetime(str(order_date))
+            except ValueError:
+                order_date = None
+            if order_date is None:
+                raise RowError("Invalid order date.")
+            if timezone.is_naive(order_date):
+                order_date = timezone.make_aware(order_date)
+        return {
+            "customer_id": _integer(data.get("customer_id"), "customer ID"),
+            "order_date": order_date,
+            "lines": self.parse_lines(data.get("lines")),
+        }
+
+    def write(self, batch):
+        # One SELECT for the customers and one for the products of the batch.
+        customers = set(
+            Customer.objects.filter(pk__in={row["customer_id"] for _, row in batch})
+            .values_list("pk", flat=True)
+        )
+        prices = dict(
+            Product.objects.filter(pk__in={pk for _, row in batch for pk in row["lines"]})
+            .values_list("pk", "price")
+        )
+        errors, orders, lines = [], [], []
+        for number, row in batch:
+            if row["customer_id"] not in customers:
+                errors.append((number, "Invalid customer ID."))
+                continue
+            missing = sorted(pk for pk in row["lines"] if pk not in prices)
+            if missing:
+                errors.append((number, f"Invalid product IDs: {', '.join(map(str, missing))}."))
+                continue
+            order_lines = [
+                OrderLine(product_id=pk, quantity=quantity, unit_price=prices[pk] if price is None else price)
+                for pk, (quantity, price) in row["lines"].items()
+            ]
+            orders.append(Order(
+                customer_id=row["customer_id"], order_date=row["order_date"],
+                total_amount=sum((line.line_total for line in order_lines), Decimal("0")).quantize(CENTS),
+            ))
+            lines.append(order_lines)
+        if not orders:
+            return 0, errors
+
+        # bulk_create skips the signals behind the stats row and the
+        # analytics roll-up; see crm.signals.
+        Order.objects.bulk_create(orders)
+        for order, order_lines in zip(orders, lines):
+            for line in order_lines:
+                line.order_id = order.pk
+        OrderLine.objects.bulk_create(line for order_lines in lines for line in order_lines)
+        stats.adjust(orders=len(orders), revenue=sum(order.total_amount for order in orders))
+        analytics.rewind(*(order.order_date for order in orders))
+        response_cache.bump_model_version(Order)
+        return len(orders), errors
+
+
+DATASETS = {
+    "customers": CustomerDataset(),
+    "products": ProductDataset(),
+    "orders": OrderDataset(),
+}
+
+
+def get_dataset(name):
+    try:
+        return DATASETS[name]
+    except KeyError:
+        raise TransferError(f"Unknown dataset '{name}'. Use one of: {', '.join(DATASETS)}.")
+
+
+def check_format(fmt):
+    if fmt not in FORMATS:
+        raise TransferError(f"Unknown format '{fmt}'. Use one of: {', '.join(FORMATS)}.")
+    return fmt
+
+
+# =====================================
+# Export
+# =====================================
+def filter_params(dataset, params):
+    """
+    Map query parameters to filter set names. Both the GraphQL argument
+    names (``totalAmount_Gte``) and the filter set's own
+    (``total_amount__gte``) are accepted; anything else is an error rather
+    than an export of every row. Filters on a field the model does not
+    have are left out.
+    """
+    names = {}
+    for name, filter_ in dataset.filterset_class.base_filters.items():
+        if filter_.method is None and get_model_field(dataset.model, filter_.field_name) is None:
+            continue
+        names[name] = names[to_camel_case(name)] = name
+    unknown = sorted(set(params) - set(names) - {"search"})
+    if unknown:
+        allowed = ", ".join(sorted({to_camel_case(name) for name in names.values()}))
+        raise TransferError(f"Unknown filter '{unknown[0]}'. Use search or one of: {allowed}.")
+    return {names[key]: value for key, value in params.items() if key != "search"}
+
+
+def export_queryset(dataset, params):
+    """
+    The rows of ``dataset`` matching the filter arguments in ``params``
+    (see filter_params) and an optional ``search``, in primary-key order.
+    Reads go to the replica when read routing is on; a nightly export does
+    not need the last second of writes.
+    """
+    filters = filter_params(dataset, params)
+    filterset = dataset.filterset_class(filters, queryset=dataset.queryset())
+    if not filterset.is_valid():
+        raise TransferError(
+            "; ".join(f"{name}: {' '.join(errors)}" for name, errors in filterset.errors.items())
+        )
+    queryset = search_queryset(filterset.qs, params.get("search"), rank=False)
+    if dataset.model is Order and {"product_name", "product_id"} & set(filters):
+        # Those filters join the lines; an order matching twice is one row.
+        queryset = queryset.distinct()
+    config = routing.get_config()
+    if config["ENABLED"]:
+        queryset = queryset.using(config["READ_ALIAS"])
+    return queryset
+
+
+def _buffered(pieces):
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= STREAM_BUFFER_SIZE:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def export_stream(dataset, queryset, fmt, chunk_size=None):
+    """
+    Yield ``queryset`` as CSV (with a header) or NDJSON text in pieces of
+    about STREAM_BUFFER_SIZE. Rows are fetched ``chunk_size`` at a time, so
+    memory stays flat however many rows there are.
+    """
+    chunk_size = chunk_size or get_config()["EXPORT_CHUNK_SIZE"]
+    rows = dataset.export_rows(queryset, chunk_size)
+    if fmt == "ndjson":
+        encoder = DjangoJSONEncoder(separators=(",", ":"))
+        lines = (encoder.encode(row) + "\n" for row in rows)
+        return _buffered(lines)
+
+    def csv_lines():
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(dataset.columns)
+        for row in rows:
+            writer.writerow([dataset.csv_value(column, row[column]) for column in dataset.columns])
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+        yield out.getvalue()
+
+    return _buffered(csv_lines())
+
+
+# =====================================
+# Import
+# =====================================
+def read_rows(lines, fmt):
+    """
+    Yield ``(row number, mapping or RowError)`` from an iterable of text
+    lines, parsing as it goes. Row numbers are line numbers, counting the
+    CSV header.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield number, RowError("Invalid JSON.")
+            continue
+        yield number, data if isinstance(data, dict) else RowError("Expected a JSON object.")
+
+
+class ImportReport:
+    """Counts and the first ``max_errors`` row errors of one import."""
+
+    def __init__(self, max_errors):
+        self.max_errors = max_errors
+        self.rows = 0
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, row, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "error": str(message)})
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "error_count": self.error_count,
+            # A batch's write errors come after its parse errors.
+            "errors": sorted(self.errors, key=lambda e: e["row"]),
+        }
+
+
+def import_rows(dataset, rows, batch_size=None, max_errors=None):
+    """
+    Validate and write ``(row number, mapping)`` pairs ``batch_size`` at a
+    time, each batch in its own transaction: one bad row is reported and
+    skipped, and a failure keeps the batches written before it. Returns an
+    ImportReport.
+    """
+    config = get_config()
+    batch_size = batch_size or config["IMPORT_BATCH_SIZE"]
+    report = ImportReport(config["MAX_REPORTED_ERRORS"] if max_errors is None else max_errors)
+
+    def flush(batch):
+        with transaction.atomic():
+            created, errors = dataset.write(batch)
+        report.created += created
+        for row, message in errors:
+            report.error(row, message)
+
+    batch, number = [], 0
+    try:
+        for number, data in rows:
+            report.rows += 1
+            try:
+                if isinstance(data, RowError):
+                    raise data
+                batch.append((number, dataset.parse(data)))
+            except RowError as e:
+                report.error(number, e)
+                continue
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+    except (csv.Error, UnicodeDecodeError) as e:
+        # The rest of the stream cannot be read; keep what was parsed.
+        report.error(number + 1, f"Unreadable input: {e}")
+    if batch:
+        flush(batch)
+    return report
+
+
+def import_stream(dataset, fmt, stream):
+    """Import from a binary stream of UTF-8 lines, such as an HttpRequest."""
+    lines = codecs.iterdecode(stream, "utf-8-sig")
+    return import_rows(dataset, read_rows(lines, fmt))
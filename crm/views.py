@@ -1,3 +1,441 @@
-from django.shortcuts import render
+import json
+from inspect import isawaitable
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection, transaction
+from django.http import (
+    Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseNotAllowed,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.utils.utils import set_rollback
+from graphene_django.views import GraphQLView, HttpError
+from graphql import ExecutionResult, OperationType, execute, get_operation_ast, validate_schema
+
+from crm import response_cache
+from crm import complexity, transfer
+from crm.async_utils import iterate_async
+from crm.complexity import analyse_operation
+from crm.documents import PersistedQueryError, document_cache, persisted_queries
+from crm.routing import route_operation
+from crm.tracing import can_read_metrics, metrics, trace_operation
+
+
+def operation_label(operation_ast, operation_name):
+    """``(name, type)`` of an operation for tracing."""
+    if operation_ast is None:
+        return operation_name, "unknown"
+    if not operation_name and operation_ast.name is not None:
+        operation_name = operation_ast.name.value
+    return operation_name, operation_ast.operation.value
+
+
+def forget_request_state(request):
+    """
+    Drop the loaders and totals cached on ``request`` after a mutation, so
+    that later operations in the same batch read its writes.
+    """
+    for name in ("crm_loaders", "crm_stats"):
+        request.__dict__.pop(name, None)
+
+
+class CRMGraphQLView(GraphQLView):
+    """
+    GraphQLView with cached parse/validate, automatic persisted queries,
+    query cost limits, tracing (crm.tracing) and an opt-in response cache
+    for read operations. The computed cost is reported under
+    ``extensions.cost``.
+
+    A JSON array of operations is run as a batch, in order, and answered
+    with an array of results carrying each entry's ``id`` and ``status``.
+    The operations share the request's loaders and totals, which a
+    mutation resets for the operations after it, and count against
+    ``MAX_BATCH_SIZE`` in CRM_GRAPHQL_LIMITS.
+
+    The execution path mirrors GraphQLView.execute_graphql_request; only
+    how the document is obtained and the response-cache lookup differ.
+    """
+
+    def get_extensions(self, request, data):
+        extensions = request.GET.get("extensions") or data.get("extensions")
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+        if extensions is not None and not isinstance(extensions, dict):
+            raise HttpError(HttpResponseBadRequest("Extensions must be a JSON object."))
+        return extensions
+
+    def parse_body(self, request):
+        if self.get_content_type(request) != "application/json":
+            return super().parse_body(request)
+        try:
+            data = json.loads(request.body.decode("utf-8"))
+        except (UnicodeDecodeError, ValueError):
+            raise HttpError(HttpResponseBadRequest("POST body sent invalid JSON."))
+        if isinstance(data, list):
+            self.check_batch(data)
+            # View instances are per request; this selects GraphQLView's batch path.
+            self.batch = True
+        elif not isinstance(data, dict):
+            raise HttpError(HttpResponseBadRequest("The received data is not a valid JSON query."))
+        return data
+
+    def check_batch(self, data):
+        limit = complexity.get_config()["MAX_BATCH_SIZE"]
+        if not data:
+            raise HttpError(HttpResponseBadRequest("Received an empty list in the batch request."))
+        if len(data) > limit:
+            raise HttpError(HttpResponseBadRequest(
+                f"Batch of {len(data)} operations exceeds the limit of {limit}."
+            ))
+        if not all(isinstance(entry, dict) for entry in data):
+            raise HttpError(HttpResponseBadRequest("Every batch entry must be a JSON query object."))
+
+    def get_response(self, request, data, show_graphiql=False):
+        if self.batch:
+            # Only the mutation that raised it may roll its transaction back.
+            request.__dict__.pop(MUTATION_ERRORS_FLAG, None)
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        execution_result = self.execute_graphql_request(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+
+        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+            set_rollback()
+
+        status_code = 200
+        if execution_result:
+            if execution_result.errors:
+                set_rollback()
+            response, status_code = self.format_result(execution_result)
+
+            if self.batch:
+                response["id"] = id
+                response["status"] = status_code
+
+            result = self.json_encode(request, response, pretty=show_graphiql)
+        else:
+            result = None
+
+        return result, status_code
+
+    def format_result(self, execution_result):
+        """The response body for ``execution_result``, with its extensions, and status code."""
+        status_code = 200
+        response = {}
+        if execution_result.errors:
+            response["errors"] = [self.format_error(e) for e in execution_result.errors]
+        if execution_result.errors and any(
+            not getattr(e, "path", None) for e in execution_result.errors
+        ):
+            status_code = 400
+        else:
+            response["data"] = execution_result.data
+        if execution_result.extensions:
+            response["extensions"] = execution_result.extensions
+        return response, status_code
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        document, operation_ast, cache_key, extensions, result = self.prepare_request(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+        if document is None:
+            return result
+        label = operation_label(operation_ast, operation_name)
+        with trace_operation(*label), route_operation(label[1]):
+            result = self.execute_document(
+                request, document, operation_ast, cache_key, variables, operation_name
+            )
+        if label[1] == "mutation":
+            forget_request_state(request)
+        result.extensions = extensions
+        return result
+
+    def prepare_request(self, request, data, query, variables, operation_name, show_graphiql):
+        """
+        Resolve, parse and validate the document, check its cost against the
+        limits in crm.complexity and look up the response cache. Returns
+        ``(document, operation_ast, cache_key, extensions, result)``;
+        ``document`` is None when the request ends here with ``result``.
+        """
+        try:
+            query = persisted_queries.resolve(query, self.get_extensions(request, data))
+        except PersistedQueryError as e:
+            return None, None, None, None, ExecutionResult(errors=[e])
+
+        if not query:
+            if show_graphiql:
+                return None, None, None, None, None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        schema = self.schema.graphql_schema
+
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return None, None, None, None, ExecutionResult(data=None, errors=schema_validation_errors)
+
+        try:
+            document, validation_errors = document_cache.get(
+                schema, query, self.validation_rules, graphene_settings.MAX_VALIDATION_ERRORS
+            )
+        except Exception as e:
+            return None, None, None, None, ExecutionResult(errors=[e])
+
+        operation_ast = get_operation_ast(document, operation_name)
+
+        if (
+            request.method.lower() == "get"
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None, None, None, None, None
+
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ["POST"],
+                    "Can only perform a {} operation from a POST request.".format(
+                        operation_ast.operation.value
+                    ),
+                )
+            )
+
+        if validation_errors:
+            return None, None, None, None, ExecutionResult(data=None, errors=validation_errors)
+
+        extensions = None
+        if operation_ast is not None:
+            cost, cost_errors = analyse_operation(schema, document, operation_ast, variables)
+            extensions = {"cost": cost}
+            if cost_errors:
+                return None, None, None, None, ExecutionResult(errors=cost_errors, extensions=extensions)
+
+        cache_key = None
+        if response_cache.is_cacheable(operation_ast):
+            cache_key = response_cache.response_key(
+                schema, document, variables, operation_name, request
+            )
+            cached = response_cache.get_response(cache_key)
+            if cached is not None:
+                return None, None, None, None, ExecutionResult(data=cached, extensions=extensions)
+
+        return document, operation_ast, cache_key, extensions, None
+
+    def get_execute_options(self, request, variables, operation_name):
+        execute_options = {
+            "root_value": self.get_root_value(request),
+            "context_value": self.get_context(request),
+            "variable_values": variables,
+            "operation_name": operation_name,
+            "middleware": self.get_middleware(request),
+        }
+        if self.execution_context_class:
+            execute_options["execution_context_class"] = self.execution_context_class
+        return execute_options
+
+    def execute_document(self, request, document, operation_ast, cache_key, variables, operation_name):
+        schema = self.schema.graphql_schema
+        try:
+            execute_options = self.get_execute_options(request, variables, operation_name)
+
+            if (
+                operation_ast is not None
+                and operation_ast.operation == OperationType.MUTATION
+                and (
+                    graphene_settings.ATOMIC_MUTATIONS is True
+                    or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+                )
+            ):
+                with transaction.atomic():
+                    result = execute(schema, document, **execute_options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+                return result
+
+            result = execute(schema, document, **execute_options)
+            if cache_key is not None and not result.errors:
+                response_cache.set_response(cache_key, result.data)
+            return result
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+
+class AsyncCRMGraphQLView(CRMGraphQLView):
+    """
+    CRMGraphQLView for ASGI deployments.
+
+    Queries run on graphql-core's async executor: root fields are scheduled
+    concurrently and resolvers hand ORM work to the request's sync thread
+    (see crm.async_utils), so no worker thread is held while the database
+    works. Mutations and the GraphiQL page take the sync path in that
+    thread, mutations keeping their transaction handling. Batches run their
+    operations one after another, each on the path it would take alone.
+    """
+
+    # Django infers this from get()/post(), which GraphQLView routes
+    # through dispatch() instead.
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if request.method.lower() not in ("get", "post"):
+                raise HttpError(
+                    HttpResponseNotAllowed(
+                        ["GET", "POST"], "GraphQL only supports GET and POST requests."
+                    )
+                )
+
+            data = self.parse_body(request)
+            if self.graphiql and self.can_display_graphiql(request, data):
+                return await sync_to_async(super().dispatch)(request, *args, **kwargs)
+
+            if self.batch:
+                responses = [await self.get_response_async(request, entry) for entry in data]
+                result = "[{}]".format(",".join(response for response, _ in responses))
+                status_code = max(status for _, status in responses)
+            else:
+                result, status_code = await self.get_response_async(request, data)
+            return HttpResponse(
+                status=status_code, content=result, content_type="application/json"
+            )
+
+        except HttpError as e:
+            response = e.response
+            response["Content-Type"] = "application/json"
+            response.content = self.json_encode(
+                request, {"errors": [self.format_error(e)]}
+            )
+            return response
+
+    async def get_response_async(self, request, data):
+        if self.batch:
+            request.__dict__.pop(MUTATION_ERRORS_FLAG, None)
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+        execution_result = await self.execute_graphql_request_async(
+            request, data, query, variables, operation_name
+        )
+        response, status_code = self.format_result(execution_result)
+        if self.batch:
+            response["id"] = id
+            response["status"] = status_code
+        return self.json_encode(request, response), status_code
+
+    async def execute_graphql_request_async(self, request, data, query, variables, operation_name):
+        # The persisted-query store and response cache may be database backed.
+        document, operation_ast, cache_key, extensions, result = await sync_to_async(
+            self.prepare_request
+        )(request, data, query, variables, operation_name, False)
+        if document is None:
+            return result
+
+        label = operation_label(operation_ast, operation_name)
+        with trace_operation(*label), route_operation(label[1]):
+            if operation_ast is None or operation_ast.operation != OperationType.QUERY:
+                result = await sync_to_async(self.execute_document)(
+                    request, document, operation_ast, cache_key, variables, operation_name
+                )
+                if label[1] == "mutation":
+                    forget_request_state(request)
+                result.extensions = extensions
+                return result
+
+            try:
+                result = execute(
+                    self.schema.graphql_schema, document,
+                    **self.get_execute_options(request, variables, operation_name)
+                )
+                if isawaitable(result):
+                    result = await result
+            except Exception as e:
+                return ExecutionResult(errors=[e], extensions=extensions)
+        if cache_key is not None and not result.errors:
+            await sync_to_async(response_cache.set_response)(cache_key, result.data)
+        result.extensions = extensions
+        return result
+
+
+def graphql_cache_stats(request):
+    """Hit/miss counters for the document cache and persisted queries."""
+    if not can_read_metrics(request):
+        return HttpResponseForbidden("Cache stats need a staff session or the metrics token.")
+    return JsonResponse({
+        "documents": document_cache.stats(),
+        "persisted_queries": persisted_queries.stats(),
+    })
+
+
+def graphql_metrics(request):
+    """Operation and resolver metrics in the Prometheus text format."""
+    if not can_read_metrics(request):
+        return HttpResponseForbidden("Metrics need a staff session or the metrics token.")
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def export_dataset(request, dataset, format):
+    """
+    Stream every customer, product or order matching the filter arguments
+    in the query string (``?totalAmount_Gte=5&search=...``, as in GraphQL)
+    as CSV or NDJSON, in id order, without holding the result set in
+    memory, under WSGI or ASGI. Unknown parameters are a 400. Needs a
+    staff session or the transfer token.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    if not transfer.can_export(request):
+        return HttpResponseForbidden("Exports need a staff session or the transfer token.")
+    try:
+        source = transfer.get_dataset(dataset)
+        transfer.check_format(format)
+    except transfer.TransferError as e:
+        raise Http404(str(e))
+    try:
+        queryset = transfer.export_queryset(source, request.GET)
+    except transfer.TransferError as e:
+        return HttpResponseBadRequest(str(e))
+    content = transfer.export_stream(source, queryset, format)
+    if isinstance(request, ASGIRequest):
+        content = iterate_async(content)
+    response = StreamingHttpResponse(content, content_type=transfer.FORMATS[format])
+    response["Content-Disposition"] = f'attachment; filename="{dataset}.{format}"'
+    return response
+
+
+def import_dataset(request, dataset):
+    """
+    Create customers, products or orders from a CSV or NDJSON body, read
+    as it arrives and written in batches. The format comes from
+    ``?format=`` or the Content-Type. Rows that fail validation are
+    skipped and listed in the JSON report.
+
+    Needs the transfer token as a bearer token, which a browser never sends
+    on its own; the route is CSRF-exempt because of that, so a session is
+    not enough.
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    if not transfer.has_token(request):
+        return HttpResponseForbidden("Imports need the transfer token.")
+    try:
+        target = transfer.get_dataset(dataset)
+    except transfer.TransferError as e:
+        raise Http404(str(e))
+    format = request.GET.get("format") or next(
+        (name for name, content_type in transfer.FORMATS.items()
+         if content_type.split(";")[0] == request.content_type), None
+    )
+    if format is None:
+        return HttpResponseBadRequest("Send text/csv or application/x-ndjson, or pass ?format=.")
+    try:
+        transfer.check_format(format)
+    except transfer.TransferError as e:
+        return HttpResponseBadRequest(str(e))
+    report = transfer.import_stream(target, format, request)
+    return JsonResponse(report.as_dict(), status=200 if report.created or not report.error_count else 400)
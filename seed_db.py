@@ -1,9 +1,12 @@
 import django
 import os
+import sys
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "alx_backend_graphql_crm.settings")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "alx_backend_graphql.settings")
 django.setup()
 
+from django.core.management import call_command
+
 from crm.models import Customer, Product
 
 def seed():
@@ -22,4 +25,9 @@ def seed():
     print("✅ Database seeded successfully.")
 
 if __name__ == "__main__":
-    seed()
+    # With arguments, generate a load-testing data set instead, e.g.
+    #   python seed_db.py --orders 1000000 --seed 7
+    if len(sys.argv) > 1:
+        call_command("seed_crm", *sys.argv[1:])
+    else:
+        seed()